@@ -42,10 +42,13 @@ INSTALLED_APPS = ['store',
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'store.instrumentation.QueryMetricsMiddleware',
+    'store.replica.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.carts.SessionCartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -57,15 +60,24 @@ import os
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Stock Django templates, plus render timing for QueryMetricsMiddleware
+        'BACKEND': 'store.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'store', 'templates')],
-
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process and kept in memory.
+            # Under runserver the autoreloader still empties this cache
+            # whenever a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.cart',
             ],
         },
     },
@@ -84,6 +96,84 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile, applied whenever DEBUG is off:
+# - journal_mode=WAL: readers never block the writer or each other (this
+#   is stored in the database file, so it sticks once set)
+# - transaction_mode IMMEDIATE: atomic blocks take the write lock at BEGIN
+#   and wait for it there, instead of failing with "database is locked"
+#   when a read transaction later tries to write
+# - busy_timeout: how long (ms) a writer waits for the lock before erroring
+# - synchronous=NORMAL: fsync at checkpoints only; safe from corruption in
+#   WAL mode, a power cut can lose just the last commits
+# - cache_size (negative = KiB) and mmap_size (bytes) keep hot pages in memory
+# - persistent connections, so the pragmas run once per connection rather
+#   than once per request
+SQLITE_PRODUCTION_PROFILE = {
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA busy_timeout=5000;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA cache_size=-20000;'
+            'PRAGMA mmap_size=134217728;'
+        ),
+    },
+}
+
+if not DEBUG:
+    DATABASES['default'].update(SQLITE_PRODUCTION_PROFILE)
+
+# Read replica for catalog and order-history reads (store.replica). Locally
+# it is a copy of db.sqlite3 refreshed with `manage.py sync_replica`; tests
+# point it at the default test database.
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db.replica.sqlite3',
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['store.replica.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The catalog cache holds rendered home/listing/detail pages for anonymous
+# visitors. TIMEOUT is the TTL; MAX_ENTRIES/CULL_FREQUENCY control eviction.
+# Switch to FileBasedCache (shared between processes) when running several
+# workers so invalidation reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Catalog pages (store.cache). LocMemCache is per process: fine for one
+    # worker, but version bumps made elsewhere (other workers, and the
+    # sync_replica, import_products and build_image_sizes commands) never
+    # reach it, so those pages stay stale until TIMEOUT. Use a shared
+    # backend in production; it is required with STORE_REPLICA_DATABASE.
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'store-catalog',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 3,
+        },
+    },
+    # {% cache %} fragments: the nav bar and product cards. Card keys
+    # include Product.updated_at, so edits never need an explicit purge.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'store-fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_FREQUENCY': 3,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -123,6 +213,21 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     BASE_DIR / "store" / "static"
 ]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+if not DEBUG:
+    # collectstatic writes content-hashed names plus .gz/.br variants, and
+    # {% static %} links to the hashed names (store.storage)
+    STORAGES['staticfiles']['BACKEND'] = 'store.storage.CompressedManifestStaticFilesStorage'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -131,3 +236,125 @@ import os
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# Store
+# Product listing pagination: 'cursor' (keyset on created_at/id, no COUNT or
+# OFFSET) or 'page' (numbered pages via django.core.paginator). Searches
+# always use numbered pages so results stay in relevance order.
+STORE_PRODUCT_PAGINATION = 'cursor'
+STORE_PRODUCTS_PER_PAGE = 12
+STORE_ORDERS_PER_PAGE = 10
+
+# Cache alias for anonymous catalog pages (None disables page caching)
+STORE_CATALOG_CACHE = 'catalog'
+
+# Per-request SQL/render metrics (store.instrumentation.QueryMetricsMiddleware)
+# Maximum queries per store view, keyed by URL name. Budgets include the
+# session + user lookups, and the writes of a first cart visit; checkout
+# costs one UPDATE per cart line, so its budget covers carts of ~8 lines.
+STORE_QUERY_BUDGETS = {
+    'home': 4,
+    'product_list': 4,
+    'product_detail': 5,
+    'view_cart': 8,
+    # 21 when the checkout page's reservation is still live, 25 when it
+    # has to be made at POST time
+    'checkout': 25,
+    'order_confirmation': 5,
+    'order_history': 6,
+    'order_detail': 5,
+    'api_product_list': 2,
+    'api_product_search': 2,
+    'api_product_detail': 2,
+}
+# Raise QueryBudgetExceeded instead of logging a warning (used by the tests)
+STORE_QUERY_BUDGET_STRICT = False
+# Send X-Query-Count / X-Query-Duplicates / Server-Timing response headers
+STORE_QUERY_METRICS_HEADERS = DEBUG
+
+# Per-request metrics from store.instrumentation, one JSON object per line.
+# Off by default; set a path to keep them. The file rotates at 10 MB and
+# keeps 5 old copies.
+STORE_REQUEST_METRICS_FILE = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        # Budget warnings
+        'console': {
+            'class': 'logging.StreamHandler',
+            'level': 'WARNING',
+        },
+        # One JSON object per request
+        'request_metrics': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': STORE_REQUEST_METRICS_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'message',
+            'delay': True,
+        } if STORE_REQUEST_METRICS_FILE else {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        'store.requests': {
+            'handlers': ['request_metrics', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Anonymous carts: 'cookie' keeps them in a signed cookie and only creates a
+# Cart row at login (merged into the user's cart); 'database' stores a Cart
+# per session as before.
+STORE_ANONYMOUS_CART = 'cookie'
+STORE_CART_COOKIE_NAME = 'cart'
+STORE_CART_COOKIE_AGE = 60 * 60 * 24 * 30
+
+# How long the checkout page holds stock for a cart (seconds)
+STORE_RESERVATION_TTL = 10 * 60
+
+# Attempts at the checkout transaction when SQLite reports the database locked
+STORE_CHECKOUT_LOCK_RETRIES = 3
+
+# Admin changelists count exactly up to this many rows; beyond it unfiltered
+# lists use a row estimate and filtered lists stop counting at the limit
+STORE_ADMIN_EXACT_COUNT_LIMIT = 100000
+
+# Background tasks (store.queue / run_worker): products below this stock
+# level trigger a low-stock alert after an order
+STORE_LOW_STOCK_THRESHOLD = 5
+
+# A task left running this long is assumed to belong to a dead worker and
+# is requeued, or marked dead if that was its last attempt
+STORE_TASK_STALE_SECONDS = 10 * 60
+
+# Serve home, the product list/detail pages and the cart with the async
+# views in store/async_views.py. Only worth it when running under ASGI
+# (ecomstore.asgi); under WSGI every async view needs its own event loop.
+STORE_ASYNC_VIEWS = False
+
+# Database alias that serves catalog and order-history reads during web
+# requests (None: everything reads from default). A client that writes is
+# kept on the primary for STORE_REPLICA_PIN_SECONDS, which should cover
+# the replica's lag. Needs a shared catalog cache (check store.E001).
+STORE_REPLICA_DATABASE = None
+STORE_REPLICA_PIN_SECONDS = 15
+
+# Cache-Control max-age (seconds) for files served by store.files. Hashed
+# static names never change content. Uploads get unique names, and image
+# derivatives, which are rebuilt in place, are linked with a ?v=<mtime>
+# version (store_images), so a rebuild changes the URL browsers cache.
+STORE_STATIC_MAX_AGE = 60 * 60 * 24 * 365
+STORE_MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+
+if DEBUG:
+    # Order confirmations and alerts go to the console in development
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
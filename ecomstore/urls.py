@@ -1,4 +1,3 @@
-from django.urls import path, include
 """
 URL configuration for ecomstore project.
 
@@ -15,20 +14,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+import re
 
 from django.conf import settings
-from django.conf.urls.static import static
+from django.contrib import admin
+from django.urls import include, path, re_path
+
+from store.files import serve_media, serve_static
+
+
+def file_route(prefix, view):
+    return re_path(r'^%s(?P<path>.*)$' % re.escape(prefix.lstrip('/')), view)
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('store.urls')),  # 👈 your app's URLs
+    # With ETags, Range and long-lived caching; a front-end server can
+    # take these prefixes over without any change here
+    file_route(settings.MEDIA_URL, serve_media),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-from django.conf import settings
-from django.conf.urls.static import static
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if not settings.DEBUG:
+    # runserver serves STATIC_URL from the finders while DEBUG is on
+    urlpatterns.append(file_route(settings.STATIC_URL, serve_static))
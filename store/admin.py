@@ -1,6 +1,13 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Product, Cart, CartItem, Order, OrderItem, UserProfile
+from .cache import bump_catalog_version
+from . import queue
+from .models import Product, Cart, CartItem, Order, OrderItem, UserProfile, StockReservation, Task
+from .pagination import ApproximateCountPaginator
+from .templatetags.store_images import image_url
 
 # Customize admin site
 admin.site.site_header = "E-Store Administration"
@@ -43,18 +50,86 @@ class CustomAdminSite(admin.AdminSite):
 # Use custom admin site
 admin_site = CustomAdminSite(name='admin')
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow to millions of rows.
+
+    Counts are estimated or capped (ApproximateCountPaginator) and the
+    second, unfiltered COUNT(*) the admin runs for "N total" is skipped.
+    Rows edited through list_editable are written with one bulk_update
+    per page instead of one save() each; see bulk_save().
+    """
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method == 'POST' and self.list_editable and '_save' in request.POST:
+            # save_model() below only collects the edited objects
+            request.bulk_edited = []
+            with transaction.atomic():
+                response = super().changelist_view(request, extra_context)
+                if request.bulk_edited:
+                    self.bulk_save(request, request.bulk_edited)
+            return response
+        return super().changelist_view(request, extra_context)
+
+    def save_model(self, request, obj, form, change):
+        if change and getattr(request, 'bulk_edited', None) is not None:
+            request.bulk_edited.append(obj)
+        else:
+            super().save_model(request, obj, form, change)
+
+    def bulk_save(self, request, objs):
+        fields = list(self.list_editable)
+        if any(f.name == 'updated_at' for f in self.model._meta.concrete_fields):
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields.append('updated_at')
+        self.model._default_manager.bulk_update(objs, fields, batch_size=500)
+
+class StockFilter(admin.SimpleListFilter):
+    """Fixed stock bands; filtering on raw stock values would SELECT DISTINCT over the table"""
+    title = 'stock'
+    parameter_name = 'stock_level'
+
+    def lookups(self, request, model_admin):
+        return [('out', 'Out of stock'), ('low', 'Low (under 10)'), ('in', 'In stock')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'out':
+            return queryset.filter(stock=0)
+        if self.value() == 'low':
+            return queryset.filter(stock__gt=0, stock__lt=10)
+        if self.value() == 'in':
+            return queryset.filter(stock__gt=0)
+        return queryset
+
+class TaskNameFilter(admin.SimpleListFilter):
+    """Registered task names; a plain 'name' filter would SELECT DISTINCT over the task table"""
+    title = 'task'
+    parameter_name = 'task'
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in sorted(queue.registry)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(name=self.value())
+        return queryset
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'stock', 'created_at', 'image_preview']
-    list_filter = ['created_at', 'stock']
-    search_fields = ['name', 'description']
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['name', 'sku', 'price', 'stock', 'created_at', 'image_preview']
+    list_filter = ['created_at', StockFilter]
+    date_hierarchy = 'created_at'
+    search_fields = ['sku', 'name', 'description']
     list_editable = ['price', 'stock']
     readonly_fields = ['image_preview', 'created_at', 'updated_at']
     actions = ['delete_selected']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'description', 'price', 'stock')
+            'fields': ('name', 'sku', 'description', 'price', 'stock')
         }),
         ('Image Management', {
             'fields': ('image', 'image_preview'),
@@ -70,11 +145,17 @@ class ProductAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 100px; object-fit: cover; border-radius: 8px; border: 2px solid #ddd;" />',
-                obj.image.url
+                image_url(obj.image, 'thumb')
             )
         return format_html('<span style="color: #999;">No Image</span>')
     image_preview.short_description = 'Image Preview'
     
+    def bulk_save(self, request, objs):
+        super().bulk_save(request, objs)
+        # Price/stock edits don't touch the search index or images, but
+        # cached catalog pages must go; once for the page, not per row
+        transaction.on_commit(bump_catalog_version)
+    
     def get_readonly_fields(self, request, obj=None):
         if obj:  # Editing existing object
             return self.readonly_fields
@@ -82,22 +163,61 @@ class ProductAdmin(admin.ModelAdmin):
             return ['image_preview', 'created_at', 'updated_at']
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'session_key', 'created_at']
+    list_select_related = ['user']
     list_filter = ['created_at']
     search_fields = ['user__username']
     readonly_fields = ['created_at']
+    raw_id_fields = ['user']
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ['cart', 'product', 'quantity', 'total_price']
+    list_select_related = ['cart', 'product']
     list_filter = ['created_at']
     readonly_fields = ['created_at']
+    raw_id_fields = ['cart', 'product']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            line_total=ExpressionWrapper(
+                F('quantity') * F('product__price'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+    
+    def total_price(self, obj):
+        return f'{obj.line_total:.2f}'
+    total_price.short_description = 'Total price'
+    total_price.admin_order_field = 'line_total'
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['cart', 'product', 'quantity', 'expires_at']
+    list_select_related = ['product']
+    raw_id_fields = ['cart', 'product']
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', TaskNameFilter]
+    search_fields = ['=id', 'name']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error']
+    actions = ['retry_tasks']
+    
+    @admin.action(description='Retry selected tasks')
+    def retry_tasks(self, request, queryset):
+        count = queue.retry(queryset)
+        self.message_user(request, f'{count} tasks queued again.')
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ['order_number', 'user', 'total_amount', 'status', 'created_at']
+    list_select_related = ['user']
     list_filter = ['status', 'created_at']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['user']
     search_fields = ['order_number', 'user__username']
     list_editable = ['status']
     readonly_fields = ['order_number', 'created_at', 'updated_at']
@@ -116,9 +236,11 @@ class OrderAdmin(admin.ModelAdmin):
     )
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdmin):
     list_display = ['order', 'product', 'quantity', 'price']
+    list_select_related = ['order', 'product']
     list_filter = ['order__status']
+    raw_id_fields = ['order', 'product']
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -143,7 +265,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         if obj.profile_picture:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px; object-fit: cover; border-radius: 50%; border: 2px solid #ddd;" />',
-                obj.profile_picture.url
+                image_url(obj.profile_picture, 'thumb')
             )
         return format_html('<span style="color: #999;">No Image</span>')
     profile_picture_preview.short_description = 'Profile Picture'
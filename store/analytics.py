@@ -0,0 +1,173 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Order, OrderItem, DailyProductSales, DailyStatusSales, JobCheckpoint
+
+# last_id is the highest order id folded in; last_time is when the last
+# run started, from which status changes still need picking up
+CHECKPOINT = 'sales_rollups'
+
+# Changed orders are looked for a little before the last run started, so
+# a transaction that committed late is not missed (re-rolling a day is
+# idempotent)
+LATE_COMMIT_GRACE = timedelta(minutes=5)
+
+# Longest stretch of days rebuilt in one transaction
+MAX_RUN_DAYS = 31
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _day_bounds(first, last):
+    """Aware datetimes covering local days first..last inclusive"""
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    return start, end
+
+
+def _day_runs(days):
+    """Group dates into contiguous (first, last) runs of at most MAX_RUN_DAYS"""
+    run = []
+    for day in sorted(days):
+        if run and (day - run[-1]).days == 1 and len(run) < MAX_RUN_DAYS:
+            run.append(day)
+            continue
+        if run:
+            yield run[0], run[-1]
+        run = [day]
+    if run:
+        yield run[0], run[-1]
+
+
+def _order_days(orders):
+    return set(
+        orders.order_by().annotate(day=TruncDate('created_at'))
+        .values_list('day', flat=True).distinct()
+    )
+
+
+def rollup_days(first, last):
+    """Recompute both rollups for local days first..last from the order tables"""
+    start, end = _day_bounds(first, last)
+    line_revenue = Sum(F('price') * F('quantity'), output_field=MONEY)
+
+    product_rows = (
+        OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+        .exclude(order__status='cancelled')
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'product_id')
+        .annotate(units=Sum('quantity'), revenue=line_revenue,
+                  orders=Count('order_id', distinct=True))
+        .order_by()
+    )
+    status_rows = (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(
+            orders=Count('id', distinct=True),
+            units=Coalesce(Sum('items__quantity'), 0),
+            revenue=Coalesce(Sum(F('items__price') * F('items__quantity'), output_field=MONEY),
+                             0, output_field=MONEY),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailyProductSales.objects.filter(day__gte=first, day__lte=last).delete()
+        DailyStatusSales.objects.filter(day__gte=first, day__lte=last).delete()
+        DailyProductSales.objects.bulk_create(
+            (DailyProductSales(**row) for row in product_rows.iterator()), batch_size=1000
+        )
+        DailyStatusSales.objects.bulk_create(DailyStatusSales(**row) for row in status_rows)
+
+
+def update_sales_rollups(batch_size=5000):
+    """Fold new orders and status changes since the last run into the rollups.
+
+    Days touched by orders with ids past the checkpoint, or by orders
+    whose updated_at moved since the previous run, are recomputed whole
+    (delete + INSERT from one GROUP BY per contiguous run of days), so the
+    work follows the activity, not the size of the history. Returns
+    (orders scanned, days recomputed).
+    """
+    started = timezone.now()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    newest = Order.objects.aggregate(newest=Max('id'))['newest'] or 0
+
+    days = set()
+    scanned = 0
+    last_id = checkpoint.last_id
+    while last_id < newest:
+        ids = list(
+            Order.objects.filter(id__gt=last_id, id__lte=newest)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        days |= _order_days(Order.objects.filter(id__gte=ids[0], id__lte=ids[-1]))
+        scanned += len(ids)
+        last_id = ids[-1]
+
+    if checkpoint.last_time:
+        since = checkpoint.last_time - LATE_COMMIT_GRACE
+        changed = Order.objects.filter(updated_at__gte=since, id__lte=checkpoint.last_id)
+        days |= _order_days(changed)
+
+    for first, last in _day_runs(days):
+        rollup_days(first, last)
+
+    checkpoint.last_id = newest
+    checkpoint.last_time = started
+    checkpoint.save(update_fields=['last_id', 'last_time', 'updated_at'])
+    return scanned, len(days)
+
+
+def rebuild_sales_rollups(batch_size=5000):
+    """Throw the rollups away and recompute them from every order"""
+    with transaction.atomic():
+        DailyProductSales.objects.all().delete()
+        DailyStatusSales.objects.all().delete()
+        JobCheckpoint.objects.filter(name=CHECKPOINT).update(last_id=0, last_time=None)
+    return update_sales_rollups(batch_size=batch_size)
+
+
+def sales_report(first, last, top=10):
+    """Dashboard figures for days first..last, read from the rollups only"""
+    status_rows = DailyStatusSales.objects.filter(day__gte=first, day__lte=last)
+    by_status = list(
+        status_rows.values('status')
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue')
+    )
+    # Daily points for up to a quarter, monthly beyond that
+    period = TruncMonth('day') if (last - first).days > 92 else F('day')
+    series = list(
+        status_rows.exclude(status='cancelled')
+        .annotate(period=period).values('period')
+        .annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+        .order_by('period')
+    )
+    top_products = list(
+        DailyProductSales.objects.filter(day__gte=first, day__lte=last)
+        .values('product_id', 'product__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders'))
+        .order_by('-revenue')[:top]
+    )
+    sold = [row for row in by_status if row['status'] != 'cancelled']
+    checkpoint = JobCheckpoint.objects.filter(name=CHECKPOINT).first()
+    return {
+        'first': first,
+        'last': last,
+        'orders': sum(row['orders'] for row in sold),
+        'units': sum(row['units'] for row in sold),
+        'revenue': sum((row['revenue'] for row in sold), 0),
+        'by_status': by_status,
+        'series': series,
+        'top_products': top_products,
+        'updated_at': checkpoint.updated_at if checkpoint else None,
+    }
@@ -0,0 +1,226 @@
+"""Read-only JSON catalog API.
+
+Every response carries a strong ETag and Last-Modified computed from
+Product.updated_at (max and count over the listed set, or the single row
+for detail). Those validators are memoised in the catalog cache under the
+catalog version, so a poll with a matching If-None-Match is answered 304
+before any product query runs; any product change bumps the version.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .cache import get_catalog_cache, get_catalog_version
+from .models import Product
+from .pagination import paginate_by_cursor
+from .search import search_products
+from .templatetags.store_images import image_url
+
+# Selectable fields -> model columns they read
+FIELDS = {
+    'id': ['id'],
+    'sku': ['sku'],
+    'name': ['name'],
+    'description': ['description'],
+    'price': ['price'],
+    'stock': ['stock'],
+    'image': ['image'],
+    'thumbnail': ['image'],
+    'url': [],
+    'created_at': ['created_at'],
+    'updated_at': ['updated_at'],
+}
+LIST_FIELDS = ['id', 'sku', 'name', 'price', 'stock', 'thumbnail', 'url']
+DETAIL_FIELDS = list(FIELDS)
+MAX_LIMIT = 100
+
+
+class BadRequest(Exception):
+    pass
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def requested_fields(request, default):
+    raw = request.GET.get('fields')
+    if not raw:
+        return default
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(FIELDS)}")
+    return fields
+
+
+def load_columns(fields):
+    """Model columns for .only(); created_at/id are needed by the cursor"""
+    columns = {'id', 'created_at'}
+    for name in fields:
+        columns.update(FIELDS[name])
+    return sorted(columns)
+
+
+def serialize(request, product, fields):
+    data = {}
+    for name in fields:
+        if name == 'url':
+            value = request.build_absolute_uri(reverse('api_product_detail', args=[product.pk]))
+        elif name in ('image', 'thumbnail'):
+            url = image_url(product.image, 'detail' if name == 'image' else 'card')
+            value = request.build_absolute_uri(url) if url else None
+        else:
+            value = getattr(product, name)
+        data[name] = value
+    return data
+
+
+def listed_products(request):
+    products = Product.objects.filter(stock__gt=0)
+    query = request.GET.get('q', '').strip()
+    if query:
+        products = search_products(products, query)
+    return products
+
+
+def product_set_validators(request, *args, **kwargs):
+    """(etag, last_modified) for the listed set: newest updated_at plus row count"""
+    summary = listed_products(request).order_by().aggregate(
+        last_modified=Max('updated_at'), count=Count('id')
+    )
+    last_modified = summary['last_modified']
+    stamp = last_modified.isoformat() if last_modified else ''
+    return f"{stamp}/{summary['count']}", last_modified
+
+
+def product_validators(request, product_id):
+    last_modified = Product.objects.filter(pk=product_id).values_list('updated_at', flat=True).first()
+    if last_modified is None:
+        return None, None
+    return f'{product_id}/{last_modified.isoformat()}', last_modified
+
+
+def conditional(validators):
+    """Answer If-None-Match / If-Modified-Since before the view runs.
+
+    ``validators(request, *args, **kwargs)`` returns (stamp, last_modified)
+    and is cached per URL under the catalog version. The ETag hashes the
+    stamp with the full path, so different fields/cursor/q values get
+    different tags.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            cache = get_catalog_cache()
+            path = request.get_full_path()
+            key = None
+            if cache is not None:
+                digest = hashlib.md5(path.encode()).hexdigest()
+                key = f'catalog:api:{get_catalog_version(cache)}:{digest}'
+                cached = cache.get(key)
+            if key is None or cached is None:
+                cached = validators(request, *args, **kwargs)
+                if key is not None:
+                    cache.set(key, cached)
+            stamp, last_modified = cached
+
+            if stamp is None:
+                return view_func(request, *args, **kwargs)
+            etag = '"%s"' % hashlib.sha1(f'{stamp}|{path}'.encode()).hexdigest()
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                # Clients may keep the body but must revalidate each time
+                patch_cache_control(response, public=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def product_page(request, fields):
+    try:
+        limit = int(request.GET.get('limit', settings.STORE_PRODUCTS_PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit must be a number')
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    products = listed_products(request).only(*load_columns(fields))
+    if request.GET.get('q', '').strip():
+        # Searches stay in relevance order, so they page by number: one
+        # extra row says whether there is a next page, with no COUNT(*)
+        try:
+            number = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            raise BadRequest('page must be a number')
+        rows = list(products[(number - 1) * limit:number * limit + 1])
+        page = rows[:limit]
+        param = 'page'
+        next_value = number + 1 if len(rows) > limit else None
+        previous_value = number - 1 if number > 1 else None
+    else:
+        page = paginate_by_cursor(products, request.GET.get('cursor'), limit)
+        param = 'cursor'
+        next_value, previous_value = page.next_cursor, page.previous_cursor
+
+    def link(value):
+        if not value:
+            return None
+        params = request.GET.copy()
+        params[param] = value
+        return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+    return {
+        'results': [serialize(request, product, fields) for product in page],
+        'next': link(next_value),
+        'previous': link(previous_value),
+    }
+
+
+@require_safe
+@conditional(product_set_validators)
+def product_list(request):
+    """In-stock products, newest first, cursor paged"""
+    try:
+        return JsonResponse(product_page(request, requested_fields(request, LIST_FIELDS)))
+    except BadRequest as e:
+        return error(str(e), 400)
+
+
+@require_safe
+@conditional(product_set_validators)
+def product_search(request):
+    """In-stock products matching ?q=, best match first, numbered pages (?page=)"""
+    if not request.GET.get('q', '').strip():
+        return error('q is required', 400)
+    try:
+        return JsonResponse(product_page(request, requested_fields(request, LIST_FIELDS)))
+    except BadRequest as e:
+        return error(str(e), 400)
+
+
+@require_safe
+@conditional(product_validators)
+def product_detail(request, product_id):
+    """A single product"""
+    try:
+        fields = requested_fields(request, DETAIL_FIELDS)
+    except BadRequest as e:
+        return error(str(e), 400)
+    product = Product.objects.only(*load_columns(fields)).filter(pk=product_id).first()
+    if product is None:
+        return error('No such product', 404)
+    return JsonResponse(serialize(request, product, fields))
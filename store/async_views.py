@@ -0,0 +1,115 @@
+"""Async versions of the read-heavy storefront views.
+
+With STORE_ASYNC_VIEWS on, store/urls.py routes home, the product
+listing and detail pages and the cart to these instead of their
+namesakes in views.py. They only pay off under ASGI (ecomstore.asgi):
+queries go through the async ORM and the view runs on the event loop
+instead of holding a worker thread for the whole request.
+
+Templates render synchronously, so everything they read is loaded
+first: querysets are evaluated into lists, and aload_request_state()
+resolves the lazy user and session.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.shortcuts import aget_object_or_404, render
+
+from .cache import aload_request_state, cache_catalog_page
+from .carts import uses_session_carts
+from .models import Cart, Product
+from .pagination import apaginate_by_cursor
+from .recommendations import arelated_products
+from .search import search_products
+from .views import remember_cart_count
+
+
+def numbered_page(products, number):
+    """Offset page with its rows loaded; Paginator has no async API"""
+    page = Paginator(products, settings.STORE_PRODUCTS_PER_PAGE).get_page(number)
+    page.object_list = list(page.object_list)
+    return page
+
+
+@cache_catalog_page
+async def home(request):
+    """Home page with featured products"""
+    await aload_request_state(request)
+    products = [
+        product async for product in Product.objects.filter(stock__gt=0).order_by('-created_at')[:8]
+    ]
+    return render(request, 'store/home.html', {'products': products})
+
+
+@cache_catalog_page
+async def product_list(request):
+    """Product listing with search and pagination"""
+    await aload_request_state(request)
+    products = Product.objects.filter(stock__gt=0)
+
+    search_query = request.GET.get('search', '')
+    if search_query:
+        products = search_products(products, search_query)
+
+    if settings.STORE_PRODUCT_PAGINATION == 'cursor' and not search_query:
+        page_obj = await apaginate_by_cursor(
+            products, request.GET.get('cursor'), settings.STORE_PRODUCTS_PER_PAGE
+        )
+    else:
+        if not search_query:
+            products = products.order_by('-created_at')
+        page_obj = await sync_to_async(numbered_page)(products, request.GET.get('page'))
+
+    return render(request, 'store/product_list.html', {
+        'page_obj': page_obj,
+        'search_query': search_query
+    })
+
+
+@cache_catalog_page
+async def product_detail(request, product_id):
+    """Individual product detail page"""
+    await aload_request_state(request)
+    product = await aget_object_or_404(Product, id=product_id)
+    related = await arelated_products(product)
+    if not related:
+        related = [
+            other async for other in
+            Product.objects.filter(stock__gt=0).exclude(id=product_id).order_by('-created_at')[:4]
+        ]
+
+    return render(request, 'store/product_detail.html', {
+        'product': product,
+        'related_products': related
+    })
+
+
+async def aget_or_create_cart(request):
+    """get_or_create_cart() for async views"""
+    if request.user.is_authenticated:
+        cart, created = await Cart.objects.aget_or_create(user=request.user)
+    elif uses_session_carts():
+        cart = request.session_cart
+    else:
+        if not request.session.session_key:
+            await request.session.acreate()
+        cart, created = await Cart.objects.aget_or_create(
+            session_key=request.session.session_key, user=None
+        )
+    return cart
+
+
+async def view_cart(request):
+    """View shopping cart"""
+    await aload_request_state(request)
+    cart = await aget_or_create_cart(request)
+    cart_items = await cart.alines()
+
+    summary = await cart.asummary()
+    if isinstance(cart, Cart):
+        remember_cart_count(request, summary['item_count'])
+
+    return render(request, 'store/cart.html', {
+        'cart_items': cart_items,
+        'total': summary['subtotal']
+    })
@@ -0,0 +1,471 @@
+"""Load benchmarks for the storefront views.
+
+Drives the main views through the Django test client against whatever
+database is active, recording per-request latency and SQL query counts.
+Results are plain dicts so they can be written to JSON and compared with
+a previous run to catch regressions.
+"""
+import asyncio
+import importlib
+import json
+import platform
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+
+from . import urls as store_urls
+from .carts import SessionCart
+from .models import Product, Cart, CartItem, Order
+from .orders import place_order
+
+# A run is flagged when a metric grows past these ratios of the baseline
+REGRESSION_THRESHOLDS = {
+    'p95_ms': 1.25,
+    'queries_per_request': 1.0,
+}
+
+# Template render time as reported by QueryMetricsMiddleware
+RENDER_TIMING_RE = re.compile(r'render;dur=([0-9.]+)')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def measure(name, iterations, request, setup=None, warmup=3):
+    """Time ``request()`` ``iterations`` times; ``setup()`` runs untimed before each call"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        request()
+
+    latencies, queries, render = [], [], []
+    busy = 0.0
+    for _ in range(iterations):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = request()
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: HTTP {response.status_code}')
+        busy += elapsed
+        latencies.append(elapsed * 1000)
+        queries.append(len(ctx.captured_queries))
+        timing = RENDER_TIMING_RE.search(response.get('Server-Timing', ''))
+        if timing:
+            render.append(float(timing.group(1)))
+
+    result = {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+        'throughput_rps': round(iterations / busy, 1) if busy else 0.0,
+    }
+    if render:
+        result['render_p50_ms'] = round(percentile(render, 50), 3)
+        result['render_mean_ms'] = round(statistics.fmean(render), 3)
+    return result
+
+
+class StoreBenchmark:
+    """The standard scenario set: search, detail, cart, checkout, order history"""
+
+    def __init__(self, iterations=200, seed=0):
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+
+    def prepare(self):
+        self.product_ids = list(Product.objects.filter(stock__gt=0).values_list('id', flat=True))
+        if not self.product_ids:
+            raise RuntimeError('No in-stock products; seed the database first')
+        words = Product.objects.values_list('name', flat=True)[:200]
+        self.search_terms = sorted({w.lower() for name in words for w in name.split()[:2]})
+
+        # Shopper with a populated cart, and the customer with the most orders
+        self.shopper, _ = User.objects.get_or_create(username='bench_shopper')
+        self.cart, _ = Cart.objects.get_or_create(user=self.shopper)
+        if not self.cart.items.exists():
+            for product_id in self.rng.sample(self.product_ids, min(10, len(self.product_ids))):
+                CartItem.objects.create(cart=self.cart, product_id=product_id, quantity=1)
+        self.cart.refresh_summary()
+
+        top = (Order.objects.values('user').order_by().annotate(n=Count('id'))
+               .order_by('-n').first())
+        self.customer = User.objects.get(pk=top['user']) if top else self.shopper
+
+        self.anonymous = Client()
+        self.shopper_client = Client()
+        self.shopper_client.force_login(self.shopper)
+        self.customer_client = Client()
+        self.customer_client.force_login(self.customer)
+        self.buyer = User.objects.create(username=f'bench_buyer_{self.rng.getrandbits(32)}')
+        self.buyer_client = Client()
+        self.buyer_client.force_login(self.buyer)
+
+    def scenarios(self):
+        product_list = reverse('product_list')
+        order_history = reverse('order_history')
+        view_cart = reverse('view_cart')
+        checkout = reverse('checkout')
+
+        def refill_buyer_cart():
+            cart, _ = Cart.objects.get_or_create(user=self.buyer)
+            product_id = self.rng.choice(self.product_ids)
+            CartItem.objects.get_or_create(cart=cart, product_id=product_id, defaults={'quantity': 1})
+            Product.objects.filter(pk=product_id, stock__lt=5).update(stock=100)
+
+        return {
+            'product_list_search': (lambda: self.anonymous.get(
+                product_list, {'search': self.rng.choice(self.search_terms)}), None),
+            'product_detail': (lambda: self.anonymous.get(
+                reverse('product_detail', args=[self.rng.choice(self.product_ids)])), None),
+            'view_cart': (lambda: self.shopper_client.get(view_cart), None),
+            'checkout': (lambda: self.buyer_client.post(checkout, {
+                'shipping_address': '1 Bench Road', 'phone_number': '03001234567'
+            }), refill_buyer_cart),
+            'order_history': (lambda: self.customer_client.get(order_history), None),
+        }
+
+    def run(self, only=None, log=None):
+        log = log or (lambda message: None)
+        self.prepare()
+        results = {}
+        for name, (request, setup) in self.scenarios().items():
+            if only and name not in only:
+                continue
+            results[name] = measure(name, self.iterations, request, setup)
+            log(format_result(name, results[name]))
+        return results
+
+
+def render_profiles():
+    """Template setups compared by RenderBenchmark, from no caching to full caching"""
+    engine = settings.TEMPLATES[0]
+    options = engine['OPTIONS']
+    loaders = options.get('loaders') or []
+    if loaders and isinstance(loaders[0], tuple) and loaders[0][0].endswith('cached.Loader'):
+        loaders = loaders[0][1]
+    uncached_templates = [{**engine, 'OPTIONS': {**options, 'loaders': loaders}}]
+    no_fragments = {
+        **settings.CACHES,
+        'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }
+    return {
+        # Every template re-read and re-compiled on every render
+        'no_caching': {'TEMPLATES': uncached_templates, 'CACHES': no_fragments},
+        'cached_loader': {'CACHES': no_fragments},
+        'cached_loader+fragments': {},
+    }
+
+
+class RenderBenchmark:
+    """Home and listing page render time with and without template caching.
+
+    The catalog page cache is off so every request renders; the numbers
+    to compare are render_p50_ms (template time only) and p50_ms.
+    """
+
+    def __init__(self, iterations=200):
+        self.iterations = iterations
+
+    def run(self, only=None, log=None):
+        log = log or (lambda message: None)
+        client = Client()
+        pages = {'home': reverse('home'), 'product_list': reverse('product_list')}
+        results = {}
+        for profile, overrides in render_profiles().items():
+            with override_settings(STORE_CATALOG_CACHE=None, STORE_QUERY_METRICS_HEADERS=True,
+                                   **overrides):
+                caches['template_fragments'].clear()
+                for page, url in pages.items():
+                    name = f'{page}:{profile}'
+                    if only and page not in only and name not in only:
+                        continue
+                    results[name] = measure(name, self.iterations, lambda url=url: client.get(url))
+                    log(format_result(name, results[name]))
+        return results
+
+
+@contextmanager
+def use_async_views(enabled=True):
+    """Route the storefront pages to the async (or the sync) views for the duration.
+
+    store.urls picks its views when imported, so it and the root URLconf
+    are re-imported on the way in and again on the way out.
+    """
+    def reload_urls():
+        importlib.reload(store_urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(STORE_ASYNC_VIEWS=enabled):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+async def asgi_get(app, path, headers=()):
+    """GET ``path`` straight through an ASGI application; returns the status code"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), *headers],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    request_sent = False
+    status = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Django listens for a disconnect until the response is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+class AsgiBenchmark:
+    """Throughput of the sync and the async storefront views under ASGI.
+
+    Django's ASGI application is driven in-process by ``connections``
+    concurrent clients, each sending its share of the requests back to
+    back; no ASGI server is a project dependency, and this keeps server
+    overhead out of the comparison. Sync views take a worker thread per
+    request, async views run on the event loop.
+    """
+
+    def __init__(self, iterations=200, connections=20, warmup=3):
+        self.iterations = iterations
+        self.connections = connections
+        self.warmup = warmup
+
+    def prepare(self):
+        product_ids = list(Product.objects.filter(stock__gt=0).values_list('id', flat=True)[:5])
+        if not product_ids:
+            raise RuntimeError('No in-stock products; seed the database first')
+        cart = SessionCart({pid: 1 for pid in product_ids}).to_cookie()
+        cookie = f'{settings.STORE_CART_COOKIE_NAME}={cart}'.encode()
+        self.pages = {
+            'home': (reverse('home'), ()),
+            'product_list': (reverse('product_list'), ()),
+            'product_detail': (reverse('product_detail', args=[product_ids[0]]), ()),
+            'view_cart': (reverse('view_cart'), ((b'cookie', cookie),)),
+        }
+
+    def run(self, only=None, log=None):
+        log = log or (lambda message: None)
+        self.prepare()
+        results = {}
+        for mode in ('sync', 'async'):
+            with use_async_views(mode == 'async'):
+                app = ASGIHandler()
+                for page, (path, headers) in self.pages.items():
+                    if only and page not in only:
+                        continue
+                    name = f'{page}:{mode}'
+                    results[name] = asyncio.run(self.load(app, path, headers))
+                    log(format_result(name, results[name]))
+        return results
+
+    async def load(self, app, path, headers):
+        for _ in range(self.warmup):
+            await asgi_get(app, path, headers)
+
+        latencies = []
+        per_connection = max(1, self.iterations // self.connections)
+
+        async def client():
+            for _ in range(per_connection):
+                started = time.perf_counter()
+                status = await asgi_get(app, path, headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if status >= 400:
+                    raise RuntimeError(f'{path}: HTTP {status}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(self.connections)))
+        elapsed = time.perf_counter() - started
+        return {
+            'iterations': len(latencies),
+            'connections': self.connections,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'max_ms': round(max(latencies), 3),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+        }
+
+
+def sqlite_profiles():
+    """Database settings compared by WriteBenchmark, with the settings each runs under"""
+    return {
+        # Django's defaults: rollback journal, deferred transactions, no retries
+        'default': (
+            {'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+            {'STORE_CHECKOUT_LOCK_RETRIES': 1},
+        ),
+        'production': (settings.SQLITE_PRODUCTION_PROFILE, {}),
+    }
+
+
+class WriteBenchmark:
+    """Checkout write throughput with ``writers`` threads placing orders at once.
+
+    Each writer fills a one-line cart and checks it out through
+    place_order(), back to back. Checkouts that still fail with a lock
+    error are counted, not retried here.
+    """
+
+    def __init__(self, orders=200, writers=8, seed=0):
+        self.orders = orders
+        self.writers = writers
+        self.rng = random.Random(seed)
+
+    def prepare(self):
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+        if not self.product_ids:
+            raise RuntimeError('No products; seed the database first')
+        Product.objects.update(stock=10 ** 6)
+        self.users = [
+            User.objects.get_or_create(username=f'bench_writer_{n}')[0] for n in range(self.writers)
+        ]
+
+    def run(self, only=None, log=None):
+        self.prepare()
+        per_writer = max(1, self.orders // self.writers)
+        barrier = threading.Barrier(self.writers)
+        latencies, errors = [], Counter()
+
+        def writer(user, rng):
+            try:
+                barrier.wait()
+                for _ in range(per_writer):
+                    started = time.perf_counter()
+                    try:
+                        cart = Cart.objects.create(user=user)
+                        CartItem.objects.create(cart=cart, product_id=rng.choice(self.product_ids),
+                                                quantity=1)
+                        place_order(user, cart, '1 Bench Road', '03001234567')
+                    except OperationalError as e:
+                        errors[str(e)] += 1
+                    else:
+                        latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=writer, args=(user, random.Random(self.rng.random())))
+            for user in self.users
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'writers': self.writers,
+            'orders': len(latencies),
+            'failed': sum(errors.values()),
+            'errors': dict(errors),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+        }
+
+
+def format_result(name, result):
+    line = f"{name:<36} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+    if 'queries_per_request' in result:
+        line += f"{result['queries_per_request']:>5.1f} q/req  "
+    line += f"{result['throughput_rps']:>8.1f} req/s"
+    if 'failed' in result:
+        line += f"  {result['failed']} failed"
+    if 'render_p50_ms' in result:
+        line += f"  render p50 {result['render_p50_ms']:>7.2f} ms"
+    return line
+
+
+def report(results, dataset=None, **meta):
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': dataset or {},
+            **meta,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline):
+    """List regressions of ``current`` against ``baseline`` (both report() dicts)"""
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric, ratio in REGRESSION_THRESHOLDS.items():
+            before, after = previous.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * ratio and after - before > 0.01:
+                regressions.append(f'{name}.{metric}: {before} -> {after}')
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
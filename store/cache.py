@@ -0,0 +1,210 @@
+import hashlib
+import re
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+# Forms on the catalog pages carry a per-visitor CSRF token. It is swapped
+# for a placeholder before caching and for a fresh token on every hit.
+CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = b'__catalog_csrf_token__'
+
+
+def get_catalog_cache():
+    """The cache backing catalog pages, or None when caching is switched off"""
+    alias = getattr(settings, 'STORE_CATALOG_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _fresh_version():
+    # Time based so a culled/evicted counter never comes back at a value
+    # that older, still-cached pages were stored under
+    return int(time.time() * 1000)
+
+
+def is_process_local(cache):
+    """True when other processes can't see this cache (e.g. LocMemCache).
+
+    Version bumps from management commands (sync_replica, import_products,
+    build_image_sizes) and from other web workers only reach a worker
+    through a shared backend such as Redis, Memcached or DatabaseCache.
+    """
+    return isinstance(cache, (LocMemCache, DummyCache))
+
+
+def get_catalog_version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _fresh_version()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+async def aget_catalog_version(cache):
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        version = _fresh_version()
+        if not await cache.aadd(VERSION_KEY, version, timeout=None):
+            version = await cache.aget(VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page"""
+    cache = get_catalog_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+
+
+def _count(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+async def _acount(cache, key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+
+
+def catalog_cache_stats():
+    cache = get_catalog_cache()
+    if cache is None:
+        return {'enabled': False, 'hits': 0, 'misses': 0, 'hit_ratio': 0.0}
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'enabled': True,
+        'version': get_catalog_version(cache),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def is_cacheable(request):
+    """Only anonymous GET/HEAD requests with nothing user specific on the page"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending flash messages and the cart badge are rendered into base.html
+    if len(get_messages(request)):
+        return False
+    if request.session.get('cart_count') or getattr(request, 'session_cart', None):
+        return False
+    return True
+
+
+async def aload_request_state(request):
+    """Resolve the user and load the session up front in an async view.
+
+    Both are lazy and would hit the database on first use, which is not
+    allowed from the event loop. Once loaded, is_cacheable(), the context
+    processors and base.html can read them synchronously.
+    """
+    request.user = await request.auser()
+    await request.session.aget('cart_count')
+
+
+def page_key(request, version):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'catalog:page:{version}:{digest}'
+
+
+def cache_catalog_page(view_func):
+    """Serve anonymous catalog pages from the catalog cache.
+
+    Entries are keyed by URL + query string and the catalog version, which
+    Product save/delete bumps, so edits show up immediately; TTL and
+    eviction come from the cache backend's TIMEOUT and OPTIONS.
+    """
+    if iscoroutinefunction(view_func):
+        return _acache_catalog_page(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        cache = get_catalog_cache()
+        if cache is None or not is_cacheable(request):
+            return view_func(request, *args, **kwargs)
+
+        key = page_key(request, get_catalog_version(cache))
+        cached = cache.get(key)
+        if cached is not None:
+            _count(cache, HITS_KEY)
+            return cached_response(request, cached)
+
+        _count(cache, MISSES_KEY)
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, cache_entry(response))
+        response['X-Catalog-Cache'] = 'miss'
+        return response
+
+    return wrapper
+
+
+def _acache_catalog_page(view_func):
+    """cache_catalog_page() for async views, through the async cache API"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        cache = get_catalog_cache()
+        if cache is None:
+            return await view_func(request, *args, **kwargs)
+        await aload_request_state(request)
+        if not is_cacheable(request):
+            return await view_func(request, *args, **kwargs)
+
+        key = page_key(request, await aget_catalog_version(cache))
+        cached = await cache.aget(key)
+        if cached is not None:
+            await _acount(cache, HITS_KEY)
+            return cached_response(request, cached)
+
+        await _acount(cache, MISSES_KEY)
+        response = await view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            await cache.aset(key, cache_entry(response))
+        response['X-Catalog-Cache'] = 'miss'
+        return response
+
+    return wrapper
+
+
+def cache_entry(response):
+    return {
+        'content': CSRF_INPUT_RE.sub(rb'\1' + CSRF_PLACEHOLDER + rb'\2', response.content),
+        'content_type': response['Content-Type'],
+    }
+
+
+def cached_response(request, cached):
+    content = cached['content']
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+    response = HttpResponse(content, content_type=cached['content_type'])
+    response['X-Catalog-Cache'] = 'hit'
+    return response
@@ -0,0 +1,202 @@
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
+
+from .models import Product, Cart, CartItem
+
+COOKIE_SALT = 'store.carts.session_cart'
+
+# Keeps the signed cookie comfortably under the 4KB browser limit
+MAX_LINES = 50
+
+
+class CartFull(Exception):
+    pass
+
+
+class SessionCartLine:
+    """Cart line for a cookie cart; the product id doubles as the line id"""
+
+    def __init__(self, product, quantity):
+        self.id = self.product_id = product.id
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def total_price(self):
+        return self.product.price * self.quantity
+
+
+class SessionCart:
+    """Anonymous visitor's cart, kept in a signed cookie instead of the database.
+
+    Mirrors the line API of Cart (lines, get_line, add, set_line_quantity,
+    remove_line, summary, refresh_summary, and the async alines/asummary)
+    so the cart views don't care which one they hold. Lines are {product id: quantity}.
+    """
+
+    def __init__(self, quantities=None):
+        self.quantities = dict(quantities or {})
+        self.modified = False
+        self._lines = None
+
+    @classmethod
+    def from_cookie(cls, value):
+        try:
+            data = signing.loads(value, salt=COOKIE_SALT) if value else {}
+            return cls({int(pid): int(qty) for pid, qty in data.items() if int(qty) > 0})
+        except (signing.BadSignature, ValueError, TypeError, AttributeError):
+            return cls()
+
+    def to_cookie(self):
+        return signing.dumps(
+            {str(pid): qty for pid, qty in self.quantities.items()},
+            salt=COOKIE_SALT, compress=True
+        )
+
+    def _changed(self):
+        self.modified = True
+        self._lines = None
+
+    @property
+    def item_count(self):
+        return sum(self.quantities.values())
+
+    def __bool__(self):
+        return bool(self.quantities)
+
+    def _set_lines(self, products):
+        for pid in [pid for pid in self.quantities if pid not in products]:
+            # Product was deleted since it went in the cart
+            del self.quantities[pid]
+            self.modified = True
+        self._lines = [
+            SessionCartLine(products[pid], qty) for pid, qty in self.quantities.items()
+        ]
+
+    def lines(self):
+        """Lines with their products, loaded in one query"""
+        if self._lines is None:
+            self._set_lines(Product.objects.in_bulk(list(self.quantities)))
+        return self._lines
+
+    async def alines(self):
+        if self._lines is None:
+            self._set_lines(await Product.objects.ain_bulk(list(self.quantities)))
+        return self._lines
+
+    def get_line(self, item_id):
+        for line in self.lines():
+            if line.id == item_id:
+                return line
+        raise Http404('No such cart line')
+
+    def add(self, product, quantity):
+        if product.id not in self.quantities and len(self.quantities) >= MAX_LINES:
+            raise CartFull(f'A cart can hold at most {MAX_LINES} different products.')
+        self.quantities[product.id] = self.quantities.get(product.id, 0) + quantity
+        self._changed()
+
+    def set_line_quantity(self, line, quantity):
+        self.quantities[line.id] = quantity
+        self._changed()
+
+    def remove_line(self, line):
+        self.quantities.pop(line.id, None)
+        self._changed()
+
+    @staticmethod
+    def _summarize(lines):
+        return {
+            'item_count': sum(line.quantity for line in lines),
+            'subtotal': sum((line.total_price for line in lines), Decimal('0.00')),
+        }
+
+    def summary(self):
+        return self._summarize(self.lines())
+
+    async def asummary(self):
+        return self._summarize(await self.alines())
+
+    def refresh_summary(self):
+        return self.summary()
+
+    def clear(self):
+        self.quantities.clear()
+        self._changed()
+
+
+def uses_session_carts():
+    return getattr(settings, 'STORE_ANONYMOUS_CART', 'cookie') == 'cookie'
+
+
+def merge_into_user_cart(session_cart, user):
+    """Fold a cookie cart into ``user``'s database cart, adding quantities.
+
+    Returns the user's Cart (created if needed), with its summary refreshed.
+    """
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        live = set(
+            Product.objects.filter(pk__in=list(session_cart.quantities)).values_list('pk', flat=True)
+        )
+        quantities = {pid: qty for pid, qty in session_cart.quantities.items() if pid in live}
+        existing = set(
+            cart.items.filter(product_id__in=list(quantities)).values_list('product_id', flat=True)
+        )
+        for pid in existing:
+            cart.items.filter(product_id=pid).update(quantity=F('quantity') + quantities[pid])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=pid, quantity=qty)
+            for pid, qty in quantities.items() if pid not in existing
+        ])
+        cart.refresh_summary()
+    session_cart.clear()
+    return cart
+
+
+class SessionCartMiddleware:
+    """Attach request.session_cart (from the signed cookie) and save it back when changed"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.load_cart(request)
+        return self.save_cart(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        self.load_cart(request)
+        return self.save_cart(request, await self.get_response(request))
+
+    def load_cart(self, request):
+        name = settings.STORE_CART_COOKIE_NAME
+        request.session_cart = SessionCart.from_cookie(request.COOKIES.get(name))
+
+    def save_cart(self, request, response):
+        name = settings.STORE_CART_COOKIE_NAME
+        cart = request.session_cart
+        if cart.modified:
+            if cart:
+                response.set_cookie(
+                    name, cart.to_cookie(),
+                    max_age=settings.STORE_CART_COOKIE_AGE,
+                    httponly=True,
+                    samesite='Lax',
+                    secure=settings.SESSION_COOKIE_SECURE,
+                )
+            else:
+                response.delete_cookie(name, samesite='Lax')
+        return response
@@ -0,0 +1,213 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .cache import bump_catalog_version
+from .models import Product
+
+# Column order for exports; imports need sku/name/price and take the rest if present
+FIELDS = ['sku', 'name', 'description', 'price', 'stock', 'image']
+UPDATABLE = ['name', 'description', 'price', 'stock', 'image']
+
+
+def default_sku(product_id):
+    """Sku for a product created without one (also what migration 0005 backfilled)"""
+    return f'P{product_id:06d}'
+
+
+class RowError(ValueError):
+    def __init__(self, line, message):
+        self.line = line
+        super().__init__(f'line {line}: {message}')
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) from a CSV or JSONL stream, one row at a time"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError as e:
+                    raise RowError(line_num, f'invalid JSON ({e})')
+
+
+def clean_row(line, row):
+    """Validate one input row into Product field values"""
+    sku = str(row.get('sku') or '').strip()
+    if not sku:
+        raise RowError(line, 'missing sku')
+    name = str(row.get('name') or '').strip()
+    if not name:
+        raise RowError(line, 'missing name')
+    try:
+        price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError):
+        raise RowError(line, f'bad price {row.get("price")!r}')
+    try:
+        stock = int(row.get('stock') or 0)
+    except (TypeError, ValueError):
+        raise RowError(line, f'bad stock {row.get("stock")!r}')
+    if stock < 0 or price < 0:
+        raise RowError(line, 'price and stock must not be negative')
+    values = {'sku': sku, 'name': name, 'price': price, 'stock': stock}
+    if row.get('description') is not None:
+        values['description'] = str(row['description'])
+    if row.get('image') is not None:
+        values['image'] = str(row['image'])
+    return values
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = self.created = self.updated = self.unchanged = self.errors = 0
+
+    @property
+    def rate(self):
+        return self.rows / max(time.monotonic() - self.started, 1e-6)
+
+    def summary(self):
+        return (
+            f'{self.rows} rows: {self.created} created, {self.updated} updated, '
+            f'{self.unchanged} unchanged, {self.errors} errors '
+            f'({self.rate:,.0f} rows/s)'
+        )
+
+
+def _field_value(product, field):
+    value = getattr(product, field)
+    return value.name or '' if field == 'image' else value
+
+
+def apply_batch(batch, stats, dry_run=False, on_change=None):
+    """Upsert one batch of cleaned rows keyed on sku.
+
+    One SELECT for the existing rows, then a bulk_create for new skus and
+    a bulk_update for rows whose values actually changed. ``on_change`` is
+    called with (action, sku, changes) for every create/update (the
+    dry-run diff).
+    """
+    # Last occurrence of a sku within the batch wins
+    rows = {values['sku']: values for values in batch}
+    existing = Product.objects.in_bulk(list(rows), field_name='sku')
+
+    to_create, to_update, changed_fields = [], [], set()
+    now = timezone.now()
+    for sku, values in rows.items():
+        product = existing.get(sku)
+        if product is None:
+            to_create.append(Product(**values))
+            if on_change:
+                on_change('create', sku, values)
+            continue
+        changes = {
+            field: (_field_value(product, field), values[field])
+            for field in UPDATABLE
+            if field in values and _field_value(product, field) != values[field]
+        }
+        if not changes:
+            stats.unchanged += 1
+            continue
+        for field, (_, new) in changes.items():
+            setattr(product, field, new)
+        product.updated_at = now
+        changed_fields.update(changes)
+        to_update.append(product)
+        if on_change:
+            on_change('update', sku, changes)
+
+    stats.created += len(to_create)
+    stats.updated += len(to_update)
+    if dry_run:
+        return
+
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(changed_fields) + ['updated_at'])
+        # bulk operations skip post_save, so keep search in step here
+        search.index_products(to_create + to_update)
+
+
+def import_rows(rows, batch_size=1000, dry_run=False, on_change=None,
+                on_error=None, on_progress=None):
+    """Stream (line, row) pairs into the catalog in batches. Returns ImportStats."""
+    stats = ImportStats()
+    batch = []
+    for line, row in rows:
+        stats.rows += 1
+        try:
+            batch.append(clean_row(line, row))
+        except RowError as e:
+            stats.errors += 1
+            if on_error:
+                on_error(e)
+        if len(batch) >= batch_size:
+            apply_batch(batch, stats, dry_run, on_change)
+            batch = []
+            if on_progress:
+                on_progress(stats)
+    if batch:
+        apply_batch(batch, stats, dry_run, on_change)
+    if on_progress:
+        on_progress(stats)
+    if not dry_run and (stats.created or stats.updated):
+        bump_catalog_version()
+    return stats
+
+
+def iter_products(batch_size=2000):
+    """All products in id order, fetched by keyset so memory stays flat"""
+    last_id = 0
+    while True:
+        batch = list(Product.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+
+def export_row(product):
+    return {
+        'sku': product.sku or '',
+        'name': product.name,
+        'description': product.description,
+        'price': str(product.price),
+        'stock': product.stock,
+        'image': product.image.name or '',
+    }
+
+
+def write_rows(stream, fmt, products, on_progress=None, progress_every=10000):
+    """Write products as CSV or JSONL. Returns the row count."""
+    count = 0
+    started = time.monotonic()
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+    for product in products:
+        write(export_row(product))
+        count += 1
+        if on_progress and count % progress_every == 0:
+            on_progress(count, count / max(time.monotonic() - started, 1e-6))
+    return count
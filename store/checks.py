@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core import checks
+
+from .cache import get_catalog_cache, is_process_local
+
+
+@checks.register()
+def check_replica_catalog_cache(app_configs, **kwargs):
+    """A read replica needs a catalog cache that sync_replica's bump can reach.
+
+    Otherwise a page rendered from a lagging replica right after an edit
+    is cached under the new catalog version and served stale until its
+    TTL runs out.
+    """
+    cache = get_catalog_cache()
+    if not settings.STORE_REPLICA_DATABASE or cache is None or not is_process_local(cache):
+        return []
+    return [checks.Error(
+        f'STORE_REPLICA_DATABASE is set but the catalog cache '
+        f'({settings.STORE_CATALOG_CACHE!r}) is local to each process.',
+        hint='Point STORE_CATALOG_CACHE at a shared backend (Redis, Memcached, '
+             'DatabaseCache) so sync_replica can invalidate pages in the web '
+             'workers, or set STORE_CATALOG_CACHE = None.',
+        id='store.E001',
+    )]
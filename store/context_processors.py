@@ -0,0 +1,12 @@
+from .carts import uses_session_carts
+
+
+def cart(request):
+    """Cart badge count, read from the cart cookie or session rather than the database"""
+    user = getattr(request, 'user', None)
+    session_cart = getattr(request, 'session_cart', None)
+    if session_cart is not None and uses_session_carts() and not (user and user.is_authenticated):
+        return {'cart_count': session_cart.item_count}
+    session = getattr(request, 'session', None)
+    count = session.get('cart_count', 0) if session is not None else 0
+    return {'cart_count': count}
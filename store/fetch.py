@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth another try; anything else non-200 fails straight away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchResult:
+    """Outcome of downloading one URL"""
+
+    def __init__(self, url, content=None, status=None, error=None, attempts=0, elapsed=0.0):
+        self.url = url
+        self.content = content
+        self.status = status
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.content is not None
+
+
+class FetchStats:
+    """Running totals for a batch of downloads"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ok = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes = 0
+
+    def add(self, result):
+        if result.ok:
+            self.ok += 1
+            self.bytes += len(result.content)
+        else:
+            self.failed += 1
+        self.retries += max(result.attempts - 1, 0)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-6)
+        total = self.ok + self.failed
+        return (
+            f'{total} fetched ({self.ok} ok, {self.failed} failed, {self.retries} retries), '
+            f'{self.bytes / 1_000_000:.2f} MB in {elapsed:.2f}s '
+            f'({total / elapsed:.1f} req/s, {self.bytes / 1_000_000 / elapsed:.2f} MB/s)'
+        )
+
+
+class ImageFetcher:
+    """Download many URLs in parallel over pooled keep-alive connections.
+
+    Each worker thread keeps its own requests.Session, so connections to
+    the same host are reused across downloads. Connection errors and
+    retryable statuses are retried with exponential backoff. Used as a
+    context manager, every fetch_all() inside shares one pool of workers.
+    """
+
+    def __init__(self, workers=8, retries=3, backoff=0.5, timeout=10):
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._local = threading.local()
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown()
+        self._pool = None
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def fetch(self, url):
+        started = time.monotonic()
+        result = FetchResult(url)
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            try:
+                response = self._session().get(url, timeout=self.timeout)
+                result.status = response.status_code
+                if response.status_code == 200:
+                    result.content = response.content
+                    result.error = None
+                    break
+                result.error = f'HTTP {response.status_code}'
+                if response.status_code not in RETRY_STATUSES:
+                    break
+            except requests.RequestException as e:
+                result.error = str(e)
+            if attempt <= self.retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def fetch_all(self, urls, then=None):
+        """Yield a FetchResult per distinct URL, in completion order.
+
+        ``then(result)`` runs on the worker thread straight after each
+        download, so processing the content is parallel too.
+        """
+        if self._pool is None:
+            with self:
+                yield from self.fetch_all(urls, then)
+            return
+
+        def work(url):
+            result = self.fetch(url)
+            if then is not None:
+                then(result)
+            return result
+
+        futures = [self._pool.submit(work, url) for url in dict.fromkeys(urls)]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,196 @@
+"""Serving uploaded media and collected static files.
+
+Unlike django.views.static.serve, serve_file() is meant for production
+traffic when there is no front-end server in front of Django:
+
+- a strong ETag and Last-Modified per file, answered with 304 Not Modified;
+- single byte ranges (206 Partial Content, 416 when unsatisfiable), with
+  If-Range, for resumed downloads and media seeking;
+- the .br/.gz variant written by CompressedManifestStaticFilesStorage,
+  chosen from Accept-Encoding, with no compression per request;
+- a far-future Cache-Control. Hashed static names are also marked
+  immutable, because a new version of the file gets a new name.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Precompressed variants in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# ManifestStaticFilesStorage inserts 12 hex digits of MD5 before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        name, _, q = params.replace(' ', '').partition('=')
+        try:
+            if name == 'q' and float(q) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def select_variant(request, fullpath):
+    """(path, content encoding or None) of the representation to send"""
+    accepted = accepted_encodings(request)
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + suffix):
+            return fullpath + suffix, coding
+    return fullpath, None
+
+
+def has_variants(fullpath):
+    return any(os.path.isfile(fullpath + suffix) for _, suffix in ENCODINGS)
+
+
+def file_etag(st, coding=None):
+    tag = f'{st.st_mtime_ns:x}-{st.st_size:x}'
+    if coding:
+        tag += f'-{coding}'
+    return f'"{tag}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to ignore the
+    header, or False if it can't be satisfied"""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        # Malformed or several ranges: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+@require_safe
+def serve_file(request, path, document_root, cache_control):
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    if os.path.basename(fullpath).startswith('.'):
+        raise Http404('File not found')
+
+    wants_range = 'Range' in request.headers
+    fullpath_sent, coding = (fullpath, None) if wants_range else select_variant(request, fullpath)
+    try:
+        st = os.stat(fullpath_sent)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('File not found')
+
+    etag = file_etag(st, coding)
+    last_modified = int(st.st_mtime)
+    vary = has_variants(fullpath)
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(st.st_mtime)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        if vary:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return finish(not_modified)
+
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    byte_range = None
+    if wants_range and if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.headers['Range'], st.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{st.st_size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(open(fullpath_sent, 'rb'), start, end - start + 1),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(
+            open(fullpath_sent, 'rb'), content_type=content_type,
+            filename=os.path.basename(fullpath),
+        )
+        if coding:
+            response['Content-Encoding'] = coding
+    return finish(response)
+
+
+def serve_media(request, path):
+    """Uploaded files and their derivatives from MEDIA_ROOT"""
+    return serve_file(
+        request, path, settings.MEDIA_ROOT,
+        f'public, max-age={settings.STORE_MEDIA_MAX_AGE}',
+    )
+
+
+def serve_static(request, path):
+    """Collected static files from STATIC_ROOT"""
+    if HASHED_NAME_RE.search(path):
+        cache_control = f'public, max-age={settings.STORE_STATIC_MAX_AGE}, immutable'
+    else:
+        # Unhashed names (the manifest itself, files only referenced by
+        # hand) may change under the same URL
+        cache_control = 'public, max-age=0, must-revalidate'
+    return serve_file(request, path, settings.STATIC_ROOT, cache_control)
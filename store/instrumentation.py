@@ -0,0 +1,166 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('store.requests')
+
+# Metrics for the request being handled on this thread / task
+current_metrics = ContextVar('store_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = []
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: time and remember every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries.append((sql, repr(params)))
+
+    def summary(self):
+        exact = Counter(self.queries)
+        similar = Counter(sql for sql, _ in self.queries)
+        return {
+            'queries': len(self.queries),
+            'db_ms': round(self.db_time * 1000, 2),
+            # Same SQL and same params: pure waste
+            'duplicate_queries': sum(n - 1 for n in exact.values() if n > 1),
+            # Same SQL, different params: the N+1 signature
+            'similar_queries': sum(n - 1 for n in similar.values() if n > 1),
+            'render_ms': round(self.render_time * 1000, 2),
+        }
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.render_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the metrics middleware"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+def store_view_name(request):
+    """URL name of the resolved view if it lives in the store app, else None"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not getattr(match.func, '__module__', '').startswith('store.'):
+        return None
+    return match.url_name
+
+
+class QueryMetricsMiddleware:
+    """Record query count, DB time, duplicate queries and render time per store view.
+
+    Each request is logged as one JSON line on the ``store.requests``
+    logger. With STORE_QUERY_METRICS_HEADERS the numbers are also sent as
+    X-Query-* and Server-Timing headers. STORE_QUERY_BUDGETS maps URL
+    names to a maximum query count; going over logs a warning, or raises
+    QueryBudgetExceeded when STORE_QUERY_BUDGET_STRICT is on (tests).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with self.record_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        # Connections belong to the thread the async ORM runs queries on
+        # for this request, not the event loop's, so hook them from there
+        recorder = await sync_to_async(self.record_queries)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.close)()
+            current_metrics.reset(token)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    def record_queries(self, metrics):
+        """Hook ``metrics`` into every connection of this thread until the stack is closed"""
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(metrics))
+        return stack
+
+    def report(self, request, response, metrics, total):
+        view = store_view_name(request)
+        if view is None:
+            return response
+
+        summary = metrics.summary()
+        summary.update(
+            view=view,
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            total_ms=round(total * 1000, 2),
+        )
+        budget = getattr(settings, 'STORE_QUERY_BUDGETS', {}).get(view)
+        summary['budget'] = budget
+        logger.info(json.dumps(summary))
+
+        if getattr(settings, 'STORE_QUERY_METRICS_HEADERS', False):
+            response['X-Query-Count'] = summary['queries']
+            response['X-Query-Duplicates'] = summary['duplicate_queries']
+            response['Server-Timing'] = (
+                f"db;dur={summary['db_ms']}, render;dur={summary['render_ms']}, "
+                f"total;dur={summary['total_ms']}"
+            )
+
+        if budget is not None and summary['queries'] > budget:
+            message = f"{view} ran {summary['queries']} queries (budget {budget})"
+            if getattr(settings, 'STORE_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
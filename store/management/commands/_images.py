@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from store.cache import bump_catalog_version
+from store.fetch import ImageFetcher, FetchStats
+from store.images import generate_derivatives_safely
+from store.models import Product
+
+
+def add_fetch_arguments(parser):
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Parallel downloads (default: 8)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Retries per image on connection errors / 5xx (default: 3)')
+    parser.add_argument('--timeout', type=float, default=10,
+                        help='Per-request timeout in seconds (default: 10)')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Rows per bulk write (default: 500)')
+
+
+def image_filename(product):
+    return f"{product.name.lower().replace(' ', '_')}.jpg"
+
+
+def image_fetcher(options):
+    return ImageFetcher(
+        workers=options['workers'],
+        retries=options['retries'],
+        timeout=options['timeout'],
+    )
+
+
+def attach_product_images(command, fetcher, stats, jobs, options, success_message):
+    """Download images for (product, url) jobs and attach them in bulk.
+
+    Each distinct URL is fetched once, concurrently; the worker that
+    fetched it also writes the files and builds the derivatives. The
+    image column is saved with bulk_update every --batch-size products.
+    """
+    by_url = defaultdict(list)
+    for product, url in jobs:
+        by_url[url].append(product)
+
+    def attach(result):
+        # On the worker thread: storage and Pillow only, no queries
+        if result.ok:
+            for product in by_url[result.url]:
+                product.image.save(image_filename(product), ContentFile(result.content), save=False)
+                generate_derivatives_safely(product.image)
+
+    pending = []
+
+    def flush():
+        if pending:
+            now = timezone.now()
+            for product in pending:
+                product.updated_at = now
+            Product.objects.bulk_update(pending, ['image', 'updated_at'],
+                                        batch_size=options['batch_size'])
+            pending.clear()
+
+    for result in fetcher.fetch_all(by_url, then=attach):
+        stats.add(result)
+        for product in by_url[result.url]:
+            if result.ok:
+                pending.append(product)
+                command.stdout.write(command.style.SUCCESS(f'{success_message}: {product.name}'))
+            else:
+                command.stdout.write(
+                    command.style.WARNING(f'Could not download image for {product.name}: {result.error}')
+                )
+        if len(pending) >= options['batch_size']:
+            flush()
+    flush()
+
+
+def report_fetch(command, stats):
+    if stats.ok:
+        bump_catalog_version()
+    command.stdout.write(stats.summary())
+
+
+def fetch_product_images(command, jobs, options, success_message):
+    """attach_product_images() for a single batch of jobs. Returns the FetchStats."""
+    stats = FetchStats()
+    with image_fetcher(options) as fetcher:
+        attach_product_images(command, fetcher, stats, jobs, options, success_message)
+    report_fetch(command, stats)
+    return stats
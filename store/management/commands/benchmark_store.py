@@ -0,0 +1,127 @@
+import copy
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from store import benchmarks
+from store.seeding import seed_store
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main storefront views (latency, queries per request, throughput)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--carts', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Timed requests per scenario (default: 200)')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario (repeatable)')
+        parser.add_argument('--render', action='store_true',
+                            help='Compare home and listing render time with no template caching, '
+                                 'the cached loader, and cached loader plus fragment caching')
+        parser.add_argument('--asgi', action='store_true',
+                            help='Compare throughput of the sync and async storefront views '
+                                 'through the ASGI handler with concurrent connections')
+        parser.add_argument('--connections', type=int, default=20,
+                            help='Concurrent connections for --asgi (default: 20)')
+        parser.add_argument('--writes', action='store_true',
+                            help='Compare concurrent checkout throughput on a throwaway SQLite '
+                                 'file with default settings and with SQLITE_PRODUCTION_PROFILE')
+        parser.add_argument('--writers', type=int, default=8,
+                            help='Concurrent checkout threads for --writes (default: 8)')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Leave the catalog page cache on (measures cache hits)')
+        parser.add_argument('--use-current-db', action='store_true',
+                            help='Run against the configured database instead of a '
+                                 'seeded throwaway one (checkout will write orders!)')
+        parser.add_argument('--output', help='Write results as JSON to this path')
+        parser.add_argument('--compare', help='Baseline JSON to compare against')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit non-zero if --compare finds a regression')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        test_db = None
+        try:
+            dataset = {}
+            if options['writes']:
+                results = self.benchmark_writes(options)
+            else:
+                if not options['use_current_db']:
+                    test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                    self.stdout.write('Seeding throwaway database...')
+                    dataset = seed_store(
+                        products=options['products'], users=options['users'],
+                        carts=options['carts'], orders=options['orders'], seed=options['seed'],
+                    )
+
+                cache_settings = {} if options['with_cache'] else {'STORE_CATALOG_CACHE': None}
+                with override_settings(**cache_settings):
+                    if options['render']:
+                        bench = benchmarks.RenderBenchmark(options['iterations'])
+                    elif options['asgi']:
+                        bench = benchmarks.AsgiBenchmark(options['iterations'], options['connections'])
+                    else:
+                        bench = benchmarks.StoreBenchmark(options['iterations'], seed=options['seed'])
+                    results = bench.run(only=options['scenarios'], log=self.stdout.write)
+        finally:
+            if test_db:
+                connection.creation.destroy_test_db(test_db, verbosity=0)
+            teardown_test_environment()
+
+        data = benchmarks.report(
+            results, dataset, iterations=options['iterations'], cache=options['with_cache'],
+            render=options['render'], asgi=options['asgi'], writes=options['writes'],
+        )
+        if options['output']:
+            benchmarks.save(data, options['output'])
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['compare']:
+            regressions = benchmarks.compare(data, benchmarks.load(options['compare']))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f'Regression: {regression}'))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against baseline')
+
+    def benchmark_writes(self, options):
+        """Run WriteBenchmark once per SQLite profile, each on a fresh database file"""
+        if connection.vendor != 'sqlite':
+            raise CommandError('--writes compares SQLite profiles; the database is not SQLite')
+        original = copy.deepcopy(connection.settings_dict)
+        results = {}
+        for profile, (database, overrides) in benchmarks.sqlite_profiles().items():
+            with tempfile.TemporaryDirectory() as tmp:
+                connection.close()
+                # Threads open their connections from this same dict
+                connection.settings_dict.update(copy.deepcopy(database))
+                connection.settings_dict['TEST'] = {
+                    **original['TEST'], 'NAME': os.path.join(tmp, 'benchmark.sqlite3'),
+                }
+                test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    self.stdout.write(f'Seeding {profile} database...')
+                    seed_store(products=options['products'], seed=options['seed'])
+                    with override_settings(**overrides):
+                        bench = benchmarks.WriteBenchmark(
+                            options['iterations'], options['writers'], seed=options['seed']
+                        )
+                        results[profile] = bench.run()
+                    self.stdout.write(benchmarks.format_result(profile, results[profile]))
+                    for error, count in results[profile]['errors'].items():
+                        self.stdout.write(f'  {count} x {error}')
+                finally:
+                    connection.creation.destroy_test_db(test_db, verbosity=0)
+                    connection.settings_dict.clear()
+                    connection.settings_dict.update(original)
+        return results
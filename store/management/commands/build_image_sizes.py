@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from store.cache import bump_catalog_version
+from store.images import generate_derivatives
+from store.models import Product, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Build resized WebP/JPEG derivatives for product images and profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Images processed in parallel (default: 4)')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild derivatives that already exist')
+
+    def handle(self, *args, **options):
+        fields = [
+            p.image for p in Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image')
+        ] + [
+            p.profile_picture for p in UserProfile.objects.exclude(profile_picture='')
+            .exclude(profile_picture__isnull=True).only('id', 'profile_picture')
+        ]
+        self.stdout.write(f'Found {len(fields)} images')
+
+        started = time.monotonic()
+        built = skipped = failed = files = 0
+        # Pillow releases the GIL while resizing/encoding, so threads scale
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                pool.submit(generate_derivatives, field, options['force']): field.name
+                for field in fields
+            }
+            for future in as_completed(futures):
+                try:
+                    written = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'Error processing {futures[future]}: {e}'))
+                    continue
+                if written:
+                    built += 1
+                    files += written
+                else:
+                    skipped += 1
+
+        if built:
+            # Cached cards and pages still point at the original images
+            caches['template_fragments'].clear()
+            bump_catalog_version()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Built {built} images ({files} files), skipped {skipped}, failed {failed} '
+                f'in {elapsed:.2f}s ({len(fields) / elapsed:.1f} images/s)'
+            )
+        )
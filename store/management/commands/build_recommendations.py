@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.recommendations import TOP_N, update_recommendations, rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Update "bought together" product recommendations from new orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Discard existing counts and recompute from all orders')
+        parser.add_argument('--top', type=int, default=TOP_N,
+                            help=f'Neighbours stored per product (default: {TOP_N})')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Orders folded in per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        job = rebuild_recommendations if options['rebuild'] else update_recommendations
+        orders, products = job(top_n=options['top'], batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Processed {orders} orders, refreshed neighbours for {products} products '
+                f'in {time.monotonic() - started:.2f}s'
+            )
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.analytics import update_sales_rollups, rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Update the daily sales rollups from new orders and order status changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Discard the rollups and recompute them from all orders')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='New orders scanned per query (default: 5000)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        job = rebuild_sales_rollups if options['rebuild'] else update_sales_rollups
+        orders, days = job(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Scanned {orders} new orders, recomputed {days} days '
+                f'in {time.monotonic() - started:.2f}s'
+            )
+        )
@@ -0,0 +1,115 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from store.models import Product, Cart, CartItem, Order
+
+
+class Command(BaseCommand):
+    help = "Print the database's query plan for every query the main views run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', action='append', dest='views',
+                            help='Only explain this view (repeatable)')
+        parser.add_argument('--scans-only', action='store_true',
+                            help='Only print queries whose plan has a full table scan')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.full_scans = 0
+        # Requests log in, reserve stock etc.; none of it is kept
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            self.explain_views()
+            transaction.set_rollback(True)
+
+        style = self.style.WARNING if self.full_scans else self.style.SUCCESS
+        self.stdout.write(style(f'{self.full_scans} queries with full table scans'))
+
+    def requests(self):
+        product = Product.objects.filter(stock__gt=0).order_by('-created_at', '-id').first()
+        if product is None:
+            raise CommandError('No in-stock products; seed the database first')
+        word = product.name.split()[0]
+
+        top = (Order.objects.values('user').order_by().annotate(n=Count('id'))
+               .order_by('-n').first())
+        user = User.objects.get(pk=top['user']) if top else User.objects.create(username='explain_views')
+        order = Order.objects.filter(user=user).order_by('-created_at', '-id').first()
+        cart, _ = Cart.objects.get_or_create(user=user)
+        CartItem.objects.get_or_create(cart=cart, product=product, defaults={'quantity': 1})
+
+        anonymous = Client()
+        customer = Client()
+        customer.force_login(user)
+        requests = {
+            'home': (anonymous, reverse('home')),
+            'product_list': (anonymous, reverse('product_list')),
+            'product_search': (anonymous, f"{reverse('product_list')}?search={word}"),
+            'product_detail': (anonymous, reverse('product_detail', args=[product.id])),
+            'view_cart': (customer, reverse('view_cart')),
+            'checkout': (customer, reverse('checkout')),
+            'order_history': (customer, reverse('order_history')),
+            'api_product_list': (anonymous, reverse('api_product_list')),
+        }
+        if order:
+            requests['order_detail'] = (customer, reverse('order_detail', args=[order.id]))
+        return requests
+
+    def explain_views(self):
+        requests = self.requests()
+        unknown = set(self.options['views'] or []) - set(requests)
+        if unknown:
+            raise CommandError(f"Unknown views: {', '.join(sorted(unknown))}; choose from {', '.join(requests)}")
+
+        for name, (client, url) in requests.items():
+            if self.options['views'] and name not in self.options['views']:
+                continue
+            queries = []
+
+            def capture(execute, sql, params, many, context):
+                queries.append((context['connection'], sql, params))
+                return execute(sql, params, many, context)
+
+            # Replica-routed reads run on their own connection
+            with override_settings(STORE_CATALOG_CACHE=None), ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(capture))
+                response = client.get(url)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}  GET {url}  -> {response.status_code}'))
+
+            seen = set()
+            for conn, sql, params in queries:
+                if not sql.lstrip().upper().startswith('SELECT') or (conn.alias, sql) in seen:
+                    continue
+                seen.add((conn.alias, sql))
+                self.explain(conn, sql, params)
+
+    def explain(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            rows = cursor.fetchall()
+        # SQLite rows are (id, parent, notused, detail); other backends one text column
+        plan = [row[-1] for row in rows]
+        scans = [line for line in plan if is_full_scan(line)]
+        self.full_scans += bool(scans)
+        if self.options['scans_only'] and not scans:
+            return
+        self.stdout.write(f'  [{connection.alias}] {sql[:200]}')
+        for line in plan:
+            marker = self.style.WARNING('  <- full scan') if line in scans else ''
+            self.stdout.write(f'      {line}{marker}')
+
+
+def is_full_scan(line):
+    """SQLite's 'SCAN table' without an index, or PostgreSQL's 'Seq Scan'"""
+    line = line.strip()
+    if line.startswith('SCAN '):
+        # Scanning a materialised subquery or the FTS index is fine
+        return not any(word in line for word in ('USING', 'VIRTUAL TABLE', 'CONSTANT ROW', 'subquery'))
+    return 'Seq Scan' in line
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store import catalog_io
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog out as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help="Output file (default: '-' for stdout)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Output format (default: from the file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows fetched per query (default: 2000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = catalog_io.detect_format(path, options['format'])
+
+        def on_progress(count, rate):
+            self.stderr.write(f'{count:,} rows ({rate:,.0f} rows/s)')
+
+        started = time.monotonic()
+        stream = self.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            count = catalog_io.write_rows(
+                stream, fmt, catalog_io.iter_products(options['batch_size']), on_progress
+            )
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stderr.write(
+            self.style.SUCCESS(f'Exported {count:,} products in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)')
+        )
@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from store import catalog_io
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL catalog into Product, upserting on sku'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV/JSONL file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk upsert (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print what would change without writing anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = catalog_io.detect_format(path, options['format'])
+        dry_run = options['dry_run']
+
+        def on_change(action, sku, changes):
+            if not dry_run:
+                return
+            if action == 'create':
+                self.stdout.write(self.style.SUCCESS(f'+ {sku}: {changes["name"]}'))
+            else:
+                diff = ', '.join(f'{field} {old!r} -> {new!r}' for field, (old, new) in changes.items())
+                self.stdout.write(self.style.WARNING(f'~ {sku}: {diff}'))
+
+        def on_error(error):
+            self.stderr.write(self.style.ERROR(f'Skipped {error}'))
+
+        def on_progress(stats):
+            self.stderr.write(f'{stats.rows:,} rows ({stats.rate:,.0f} rows/s)')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            stats = catalog_io.import_rows(
+                catalog_io.read_rows(stream, fmt),
+                batch_size=options['batch_size'],
+                dry_run=dry_run,
+                on_change=on_change,
+                on_error=on_error,
+                on_progress=on_progress,
+            )
+        except catalog_io.RowError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        prefix = 'Dry run: ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(prefix + stats.summary()))
@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from store.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned carts and expired sessions in small, throttled chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Carts untouched for this many days are abandoned (default: 30)')
+        parser.add_argument('--include-user-carts', action='store_true',
+                            help="Also purge logged-in users' stale carts, not just anonymous ones")
+        parser.add_argument('--skip-sessions', action='store_true',
+                            help='Leave expired django_session rows alone')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Rows deleted per transaction (default: 500)')
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help='Seconds to pause between chunks (default: 0.05)')
+        parser.add_argument('--max-chunks', type=int, default=None,
+                            help='Stop after this many chunks per table')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.started = time.monotonic()
+        self.chunks = 0
+        self.slowest = 0.0
+        deleted = {}
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stale_carts = Cart.objects.filter(updated_at__lt=cutoff)
+        if not options['include_user_carts']:
+            stale_carts = stale_carts.filter(user__isnull=True)
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'Would delete {stale_carts.count()} carts '
+                f'({CartItem.objects.filter(cart__in=stale_carts).count()} lines)'
+            )
+            if not options['skip_sessions']:
+                expired = Session.objects.filter(expire_date__lt=timezone.now()).count()
+                self.stdout.write(f'Would delete {expired} expired sessions')
+            return
+
+        deleted['carts'], deleted['cart_items'] = self.purge_carts(stale_carts)
+        if not options['skip_sessions']:
+            deleted['sessions'] = self.purge(
+                Session.objects.filter(expire_date__lt=timezone.now()), 'session_key'
+            )
+
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        total = sum(deleted.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {", ".join(f"{n} {name}" for name, n in deleted.items())} '
+            f'in {self.chunks} chunks, {elapsed:.1f}s ({total / elapsed:,.0f} rows/s, '
+            f'slowest chunk {self.slowest * 1000:.0f} ms)'
+        ))
+
+    def chunk_ids(self, queryset, key):
+        """Yield lists of primary keys, at most chunk-size at a time"""
+        chunks = 0
+        while self.options['max_chunks'] is None or chunks < self.options['max_chunks']:
+            ids = list(queryset.order_by(key).values_list(key, flat=True)[:self.options['chunk_size']])
+            if not ids:
+                return
+            chunks += 1
+            yield ids
+            if self.options['sleep']:
+                time.sleep(self.options['sleep'])
+
+    def timed(self, work):
+        started = time.monotonic()
+        with transaction.atomic():
+            result = work()
+        self.slowest = max(self.slowest, time.monotonic() - started)
+        self.chunks += 1
+        return result
+
+    def purge_carts(self, stale_carts):
+        carts = items = 0
+        for ids in self.chunk_ids(stale_carts, 'id'):
+            def work():
+                # Re-apply the filter so a cart touched since we picked it survives
+                _, counts = stale_carts.filter(id__in=ids).delete()
+                return counts.get(Cart._meta.label, 0), counts.get(CartItem._meta.label, 0)
+            cart_count, line_count = self.timed(work)
+            carts += cart_count
+            items += line_count
+        return carts, items
+
+    def purge(self, queryset, key):
+        total = 0
+        for ids in self.chunk_ids(queryset, key):
+            deleted, _ = self.timed(lambda: queryset.filter(**{f'{key}__in': ids}).delete())
+            total += deleted
+        return total
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from store import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from scratch'
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write(
+                self.style.WARNING('Full-text search needs SQLite FTS5; nothing to rebuild.')
+            )
+            return
+
+        count = search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Search index rebuilt: {count} products indexed')
+        )
@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from store import queue
+from store.models import Task
+
+
+def run_in_thread(task_obj):
+    try:
+        return queue.run_task(task_obj)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (order emails, stock alerts, reporting jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Tasks run at once, each in its own thread (default: 4)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty (default: 1)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as no task is due, instead of polling')
+        parser.add_argument('--keep-done', type=int, default=7,
+                            help='Days to keep finished tasks before deleting them (default: 7)')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        concurrency = max(1, options['concurrency'])
+        keep_done = timedelta(days=options['keep_done'])
+        counts = {Task.DONE: 0, Task.QUEUED: 0, Task.DEAD: 0}
+        started = time.monotonic()
+
+        # One thread runs tasks inline; more use a pool with a connection per thread
+        pool = ThreadPoolExecutor(concurrency) if concurrency > 1 else None
+        try:
+            while not self.stopping:
+                queue.requeue_stale()
+                batch = queue.claim(worker, concurrency)
+                if not batch:
+                    queue.purge_done(keep_done)
+                    if options['once']:
+                        break
+                    close_old_connections()
+                    time.sleep(options['poll_interval'])
+                    continue
+                results = pool.map(run_in_thread, batch) if pool else map(queue.run_task, batch)
+                for status in results:
+                    counts[status] += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts[Task.DONE]} done, {counts[Task.QUEUED]} to retry, '
+            f'{counts[Task.DEAD]} dead in {time.monotonic() - started:.1f}s'
+        ))
+
+    def stop(self, signum, frame):
+        """Finish the tasks in hand, then exit"""
+        self.stopping = True
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.seeding import seed_store, SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic products, users, carts and orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--carts', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk INSERT (default: 1000)')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Random seed for reproducible data')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = seed_store(
+            products=options['products'],
+            users=options['users'],
+            carts=options['carts'],
+            orders=options['orders'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rows = sum(created.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {", ".join(f"{n} {model}" for model, n in created.items())} '
+                f'in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)'
+            )
+        )
+        if created['users']:
+            self.stdout.write(f'Seeded users log in with password "{SEED_PASSWORD}"')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from store.reservations import sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout stock reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows deleted per statement (default: 1000)')
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired reservations'))
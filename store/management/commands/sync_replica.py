@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from store.cache import bump_catalog_version
+from store.replica import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the read replica (local stand-in for replication)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Primary database alias (default: default)')
+        parser.add_argument('--replica', default=None,
+                            help='Replica database alias (default: STORE_REPLICA_DATABASE, '
+                                 'or "replica")')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every N seconds until interrupted')
+
+    def handle(self, *args, **options):
+        replica = options['replica'] or settings.STORE_REPLICA_DATABASE or 'replica'
+        if replica not in connections.settings:
+            raise CommandError(f'No database {replica!r} in DATABASES')
+        source = connections[options['database']]
+        target = connections[replica]
+        if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; use real replication elsewhere')
+        if target.is_in_memory_db():
+            raise CommandError(f'{replica!r} is an in-memory database')
+        path = target.settings_dict['NAME']
+
+        try:
+            while True:
+                started = time.monotonic()
+                # This process's own replica connection must not hold the file open
+                target.close()
+                pages = copy_database(source, path)
+                # Pages cached while the replica lagged may be stale
+                bump_catalog_version()
+                self.stdout.write(self.style.SUCCESS(
+                    f'Copied {pages} pages to {path} in {time.monotonic() - started:.2f}s'
+                ))
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
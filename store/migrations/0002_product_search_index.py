@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from store import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor)
+    if search.fts_enabled(schema_editor.connection):
+        schema_editor.execute(
+            f"INSERT INTO {search.FTS_TABLE} (rowid, name, description) "
+            "SELECT id, name, description FROM store_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+
+def backfill_skus(apps, schema_editor):
+    """Give existing products a sku so export_products output imports back"""
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.filter(sku__isnull=True).only('id'))
+    for product in products:
+        # Same format as store.catalog_io.default_sku
+        product.sku = f'P{product.id:06d}'
+    Product.objects.bulk_update(products, ['sku'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
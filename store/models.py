@@ -1,8 +1,27 @@
 from django.db import models
+from django.db.models import F, Sum, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+class ProductQuerySet(models.QuerySet):
+    def with_available(self, exclude_cart=None):
+        """Annotate ``available``: stock minus unexpired reservations.
+
+        One correlated subquery, so it costs nothing extra on the query
+        that loads the products. Holds of ``exclude_cart`` are not counted.
+        """
+        held = StockReservation.objects.filter(product=OuterRef('pk'), expires_at__gt=Now())
+        if exclude_cart is not None:
+            held = held.exclude(cart=exclude_cart)
+        held = held.values('product').annotate(total=Sum('quantity')).values('total')
+        return self.annotate(available=F('stock') - Coalesce(Subquery(held), 0))
 
 class Product(models.Model):
+    # Stable external identifier used by catalog import/export
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -11,24 +30,112 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Admin date filters / date_hierarchy range scans
+            models.Index(fields=['created_at'], name='product_created_idx'),
+            # Storefront listings: in stock, newest first (cursor order)
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(stock__gt=0),
+                         name='product_instock_recent_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     session_key = models.CharField(max_length=40, null=True, blank=True)
+    # Denormalized from the cart lines, refreshed by refresh_summary()
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Anonymous cart lookup and the stale-cart purge
+            models.Index(fields=['session_key'], condition=models.Q(user__isnull=True),
+                         name='cart_anon_session_idx'),
+            models.Index(fields=['updated_at'], condition=models.Q(user__isnull=True),
+                         name='cart_anon_updated_idx'),
+            # Admin date filter
+            models.Index(fields=['created_at'], name='cart_created_idx'),
+        ]
+
     def __str__(self):
         return f"Cart {self.id}"
 
+    @staticmethod
+    def _summary_aggregates():
+        return {
+            'item_count': Coalesce(Sum('quantity'), 0),
+            'subtotal': Coalesce(
+                Sum(F('quantity') * F('product__price'),
+                    output_field=DecimalField(max_digits=12, decimal_places=2)),
+                0,
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        }
+
+    def summary(self):
+        """Item count and subtotal computed in a single aggregate query"""
+        return self.items.aggregate(**self._summary_aggregates())
+
+    async def asummary(self):
+        return await self.items.aaggregate(**self._summary_aggregates())
+
+    def lines(self):
+        return self.items.select_related('product')
+
+    async def alines(self):
+        """The lines as a list, for async views (templates can't run lazy queries there)"""
+        return [line async for line in self.lines()]
+
+    def get_line(self, item_id):
+        return get_object_or_404(self.lines(), id=item_id)
+
+    def add(self, product, quantity):
+        """Add ``quantity`` of ``product``, combining with an existing line"""
+        item, created = CartItem.objects.get_or_create(
+            cart=self, product=product, defaults={'quantity': quantity}
+        )
+        if not created:
+            CartItem.objects.filter(pk=item.pk).update(quantity=F('quantity') + quantity)
+
+    def set_line_quantity(self, line, quantity):
+        line.quantity = quantity
+        line.save()
+
+    def remove_line(self, line):
+        line.delete()
+
+    def refresh_summary(self):
+        """Recompute item_count/subtotal and store them without touching other fields"""
+        summary = self.summary()
+        self.item_count = summary['item_count']
+        self.subtotal = summary['subtotal']
+        # Also bumps updated_at, which the stale-cart purge goes by
+        self.updated_at = timezone.now()
+        Cart.objects.filter(pk=self.pk).update(updated_at=self.updated_at, **summary)
+        return summary
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+        indexes = [
+            # Admin date filter
+            models.Index(fields=['created_at'], name='cartitem_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
@@ -54,6 +161,15 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            # Order history: a user's orders, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_recent_idx'),
+            # Sales rollups pick up status changes by updated_at
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.order_number or self.id}"
 
@@ -74,3 +190,135 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return self.user.username
+
+class ProductPairCount(models.Model):
+    """How many orders contained both products (product == other holds the
+    product's own order count). Maintained incrementally by
+    store.recommendations."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_pair'),
+        ]
+
+class ProductNeighbor(models.Model):
+    """Precomputed top-N "bought together" list for a product"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbor_of')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_neighbor_rank'),
+        ]
+
+class JobCheckpoint(models.Model):
+    """High-water marks for incremental batch jobs (last row id processed,
+    and for jobs that follow updated_at, the time they last looked)"""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+class StockReservation(models.Model):
+    """Stock held for a cart during checkout until ``expires_at``.
+
+    Expired rows simply stop counting (see ProductQuerySet.with_available)
+    and are deleted lazily by store.reservations or the sweeper command.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_reservation'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_expiry'),
+            models.Index(fields=['expires_at'], name='reservation_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for cart {self.cart_id}"
+
+class DailyProductSales(models.Model):
+    """Units, revenue and order count per product per day (orders not
+    cancelled), maintained by store.analytics"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales'),
+        ]
+
+class DailyStatusSales(models.Model):
+    """Orders, units and revenue per order status per day, maintained by store.analytics"""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='unique_daily_status_sales'),
+        ]
+
+class Task(models.Model):
+    """A unit of background work, run by the run_worker command (see store.queue)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (DEAD, 'Dead'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    # Set by enqueue(unique=True) and cleared once the task is claimed
+    unique_key = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for due queued tasks
+            models.Index(fields=['run_at'], condition=models.Q(status='queued'), name='task_due_idx'),
+            models.Index(fields=['status', 'locked_at'], name='task_status_locked_idx'),
+        ]
+        constraints = [
+            # At most one queued copy of a unique task, however many enqueue at once
+            models.UniqueConstraint(
+                fields=['unique_key'],
+                condition=models.Q(status='queued') & ~models.Q(unique_key=''),
+                name='task_queued_unique_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
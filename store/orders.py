@@ -0,0 +1,113 @@
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from .cache import bump_catalog_version
+from .models import Product, Order, OrderItem
+from .queue import enqueue
+from .reservations import OutOfStock, holds_reservations, reserve_cart
+
+
+# First pause before retrying a checkout that found the database locked;
+# it doubles (with jitter) on each further attempt
+LOCK_RETRY_DELAY = 0.05
+
+
+def generate_order_number():
+    return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+
+
+def is_lock_error(exc):
+    """SQLite's "database is locked" / "database table is locked" / busy errors"""
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def place_order(user, cart, shipping_address, phone_number):
+    """Turn ``cart`` into an Order, decrementing stock atomically.
+
+    If the cart's stock reservations (made when the checkout page was
+    shown) are still live and match the lines, they are committed as is;
+    otherwise the lines are reserved first, which checks availability
+    against other carts' holds. Stock is then taken with one conditional
+    UPDATE per line (``stock = stock - qty WHERE stock >= qty``), always
+    in product id order so concurrent checkouts lock rows in the same
+    sequence. If any line comes up short the whole transaction rolls back
+    and OutOfStock lists every failing line. Order items are written with
+    one bulk INSERT.
+
+    When SQLite reports the database locked (another writer held it past
+    the busy timeout) the transaction is retried, up to
+    STORE_CHECKOUT_LOCK_RETRIES attempts with a short backoff.
+    """
+    cart_items = list(cart.items.select_related('product').order_by('product_id'))
+    cart_id = cart.pk
+
+    # A transaction that hit a lock error has rolled back whole, so it is
+    # safe to run again; not when it is nested in someone else's, though
+    attempts = 1 if connection.in_atomic_block else max(1, settings.STORE_CHECKOUT_LOCK_RETRIES)
+    for attempt in range(1, attempts + 1):
+        try:
+            return _place_order(user, cart, cart_items, shipping_address, phone_number)
+        except OperationalError as e:
+            if attempt == attempts or not is_lock_error(e):
+                raise
+            # cart.delete() may have run before the rollback; the row is back
+            cart.pk = cart_id
+            time.sleep(LOCK_RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+
+def _place_order(user, cart, cart_items, shipping_address, phone_number):
+    with transaction.atomic():
+        if not holds_reservations(cart, cart_items):
+            reserve_cart(cart, cart_items)
+
+        short = []
+        for item in cart_items:
+            taken = Product.objects.filter(
+                pk=item.product_id, stock__gte=item.quantity
+            ).update(stock=F('stock') - item.quantity, updated_at=Now())
+            if not taken:
+                short.append(item)
+
+        if short:
+            available = dict(
+                Product.objects.filter(pk__in=[item.product_id for item in short])
+                .values_list('pk', 'stock')
+            )
+            raise OutOfStock([(item, available.get(item.product_id, 0)) for item in short])
+
+        order = Order.objects.create(
+            user=user,
+            order_number=generate_order_number(),
+            total_amount=sum(item.total_price for item in cart_items),
+            shipping_address=shipping_address,
+            phone_number=phone_number
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price=item.product.price
+            )
+            for item in cart_items
+        ])
+
+        # Takes the cart's reservations with it
+        cart.delete()
+
+        # Stock moved through update(), which skips the Product signals;
+        # updated_at was bumped above so API ETags change too
+        transaction.on_commit(bump_catalog_version)
+
+        # Emails, stock alerts and reporting run on the worker; the task
+        # row commits (or rolls back) with the order
+        enqueue('store.order_placed', order_id=order.id)
+
+    return order
@@ -0,0 +1,191 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections, models
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'store.pagination.cursor'
+
+
+def encode_cursor(product, direction):
+    """Opaque, signed token pointing just past ``product`` in ``direction``"""
+    return signing.dumps(
+        [product.created_at.isoformat(), product.pk, direction],
+        salt=CURSOR_SALT,
+    )
+
+
+def decode_cursor(token):
+    """Return (created_at, id, direction), or None for a missing/bad token"""
+    if not token:
+        return None
+    try:
+        created_at, pk, direction = signing.loads(token, salt=CURSOR_SALT)
+        if direction not in ('next', 'prev'):
+            return None
+        return datetime.fromisoformat(created_at), int(pk), direction
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+
+class CursorPage:
+    """One page of a keyset-paginated listing, newest first.
+
+    Mirrors the parts of django.core.paginator.Page the templates use
+    (iteration, has_next/has_previous, has_other_pages) and adds the
+    next/previous cursor tokens.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+def _cursor_query(queryset, token, per_page):
+    """The page query for ``token``, and a function that turns its rows into a CursorPage"""
+    cursor = decode_cursor(token)
+
+    if cursor is None:
+        query = queryset.order_by('-created_at', '-id')[:per_page + 1]
+        return query, lambda rows: CursorPage(rows[:per_page], len(rows) > per_page, False)
+
+    created_at, pk, direction = cursor
+    if direction == 'next':
+        query = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        ).order_by('-created_at', '-id')[:per_page + 1]
+        return query, lambda rows: CursorPage(rows[:per_page], len(rows) > per_page, True)
+
+    query = queryset.filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+    ).order_by('created_at', 'id')[:per_page + 1]
+
+    def previous_page(rows):
+        page = rows[:per_page]
+        page.reverse()
+        return CursorPage(page, True, len(rows) > per_page)
+    return query, previous_page
+
+
+def paginate_by_cursor(queryset, token, per_page):
+    """Keyset pagination on (created_at, id), newest first.
+
+    Each page is a single indexed range query with LIMIT per_page + 1 (the
+    extra row tells us whether another page exists), so there is no COUNT(*)
+    and page N costs the same as page 1.
+    """
+    query, make_page = _cursor_query(queryset, token, per_page)
+    return make_page(list(query))
+
+
+async def apaginate_by_cursor(queryset, token, per_page):
+    """paginate_by_cursor() for async views"""
+    query, make_page = _cursor_query(queryset, token, per_page)
+    return make_page([row async for row in query])
+
+
+def estimated_row_count(queryset):
+    """Cheap row estimate for a whole table, or None if unavailable.
+
+    PostgreSQL keeps one in pg_class; elsewhere the primary key span
+    (two index probes) stands in, which overshoots only by deleted rows.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    if not isinstance(model._meta.pk, (models.AutoField, models.BigAutoField)):
+        return None
+    span = model._default_manager.using(queryset.db).aggregate(first=Min('pk'), last=Max('pk'))
+    if span['last'] is None:
+        return 0
+    return span['last'] - span['first'] + 1
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator for admin changelists over very large tables.
+
+    An unfiltered changelist takes its count from estimated_row_count()
+    once the table is past STORE_ADMIN_EXACT_COUNT_LIMIT rows; a filtered
+    one counts at most that many matches (COUNT over a LIMITed subquery),
+    so no page load scans the whole table just to print a total.
+
+    Such totals are approximate (``count_kind`` is 'estimate' or
+    'at_least'; the admin shows "about"/"at least"), so pages are not
+    bounded by them: a capped total offers one more page, pages past it
+    stay reachable, and a page past the real end (an estimate overshoots
+    by id gaps) comes back empty instead of raising.
+    """
+    count_kind = None
+
+    @cached_property
+    def count(self):
+        limit = settings.STORE_ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset)
+            if estimate is not None and estimate > limit:
+                self.count_kind = 'estimate'
+                return estimate
+        count = queryset[:limit].count()
+        if count >= limit:
+            self.count_kind = 'at_least'
+        return count
+
+    @cached_property
+    def num_pages(self):
+        pages = super().num_pages
+        return pages + 1 if self.count_kind == 'at_least' else pages
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_kind is None or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_kind is None:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
@@ -0,0 +1,176 @@
+"""A small task queue kept in the main database.
+
+Handlers are plain functions registered with @task; enqueue() writes a
+Task row, so enqueueing inside a transaction is atomic with the work
+that triggered it (the task only becomes visible if that commits).
+The run_worker command claims due tasks, runs them, retries failures
+with exponential backoff and moves tasks that keep failing to the
+``dead`` status, where they stay for inspection or a manual retry
+from the admin.
+"""
+import hashlib
+import json
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger('store.queue')
+
+# Registered handlers by task name
+registry = {}
+
+# Retry delay is BACKOFF * 2 ** (attempt - 1), capped at MAX_BACKOFF
+BACKOFF = timedelta(seconds=10)
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def task(name=None, max_attempts=5):
+    """Register a function as a task handler: @task() or @task('name')"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = func
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        return func
+    return decorator
+
+
+def task_key(name, payload):
+    return hashlib.sha256(json.dumps([name, payload], sort_keys=True).encode()).hexdigest()
+
+
+def enqueue(handler, delay=None, unique=False, **payload):
+    """Queue ``handler`` (a registered function or its name) with keyword arguments.
+
+    ``unique`` skips the insert when an identical task is already queued,
+    for idempotent catch-up jobs that only need to run once more. A
+    partial unique index on queued tasks settles concurrent enqueues.
+    """
+    name = getattr(handler, 'task_name', handler)
+    func = registry.get(name)
+    if func is None:
+        raise KeyError(f'No task registered as {name!r}')
+    fields = {
+        'name': name,
+        'payload': payload,
+        'max_attempts': func.max_attempts,
+        'run_at': timezone.now() + (delay or timedelta(0)),
+    }
+    if not unique:
+        return Task.objects.create(**fields)
+
+    key = task_key(name, payload)
+    while True:
+        existing = Task.objects.filter(unique_key=key, status=Task.QUEUED).first()
+        if existing:
+            return existing
+        try:
+            with transaction.atomic():
+                return Task.objects.create(unique_key=key, **fields)
+        except IntegrityError:
+            # Another enqueue won the race; go back and return its task
+            continue
+
+
+def due_tasks():
+    return Task.objects.filter(status=Task.QUEUED, run_at__lte=timezone.now())
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due tasks as running for ``worker`` and return them.
+
+    Rows are picked with SKIP LOCKED where the database has it; the
+    conditional UPDATE on status means two workers can never both win
+    the same task either way. Claimed tasks drop their unique_key, so a
+    unique task can be queued again (and retried) while one runs.
+    """
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        ids = list(
+            due_tasks().select_for_update(skip_locked=True)
+            .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Task.objects.filter(id__in=ids, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=token, locked_at=timezone.now(),
+            attempts=F('attempts') + 1, unique_key='',
+        )
+    return list(Task.objects.filter(locked_by=token, status=Task.RUNNING).order_by('run_at', 'id'))
+
+
+def retry_delay(attempts):
+    return min(BACKOFF * 2 ** max(attempts - 1, 0), MAX_BACKOFF)
+
+
+def run_task(task_obj):
+    """Run one claimed task and record the outcome. Returns the new status."""
+    func = registry.get(task_obj.name)
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {task_obj.name!r}')
+        func(**task_obj.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if func is None or task_obj.attempts >= task_obj.max_attempts:
+            status, run_at = Task.DEAD, task_obj.run_at
+            logger.error('Task %s is dead after %s attempts:\n%s', task_obj, task_obj.attempts, error)
+        else:
+            status, run_at = Task.QUEUED, timezone.now() + retry_delay(task_obj.attempts)
+            logger.warning('Task %s failed, retrying at %s', task_obj, run_at)
+        Task.objects.filter(pk=task_obj.pk).update(
+            status=status, run_at=run_at, last_error=error, locked_by='', locked_at=None,
+            finished_at=timezone.now() if status == Task.DEAD else None,
+        )
+        return status
+
+    Task.objects.filter(pk=task_obj.pk).update(
+        status=Task.DONE, locked_by='', locked_at=None, finished_at=timezone.now(),
+    )
+    return Task.DONE
+
+
+def requeue_stale(older_than=None):
+    """Put tasks whose worker vanished mid-run back in the queue.
+
+    A task that has used up its attempts (say, one that crashes the
+    worker every time) goes to ``dead`` instead. Returns the number
+    requeued.
+    """
+    if older_than is None:
+        older_than = timedelta(seconds=settings.STORE_TASK_STALE_SECONDS)
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - older_than)
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.DEAD, last_error=f'Worker vanished mid-run (locked over {older_than} ago)',
+        locked_by='', locked_at=None, finished_at=now,
+    )
+    if dead:
+        logger.error('%s stale tasks are dead after their last attempt', dead)
+    return stale.update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def retry(queryset):
+    """Send dead (or any) tasks round again with a fresh attempt budget"""
+    return queryset.exclude(status=Task.RUNNING).update(
+        status=Task.QUEUED, attempts=0, run_at=timezone.now(),
+        locked_by='', locked_at=None, finished_at=None,
+    )
+
+
+def purge_done(older_than, chunk_size=1000):
+    """Delete finished tasks older than ``older_than``, one chunk per call"""
+    ids = list(
+        Task.objects.filter(status=Task.DONE, finished_at__lt=timezone.now() - older_than)
+        .order_by('id').values_list('id', flat=True)[:chunk_size]
+    )
+    deleted, _ = Task.objects.filter(id__in=ids).delete()
+    return deleted
@@ -0,0 +1,138 @@
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product, ProductPairCount, ProductNeighbor, JobCheckpoint
+
+CHECKPOINT = 'recommendations'
+
+# Neighbours kept per product
+TOP_N = 8
+
+
+def _count_pairs(first_order_id, last_order_id):
+    """Add co-purchase counts for orders in (first, last] into ProductPairCount.
+
+    A single INSERT ... SELECT self-join over the new order lines, upserted
+    onto the running totals, so the work is proportional to the new orders
+    only. Pairs where product == other carry each product's order count.
+    """
+    pairs = ProductPairCount._meta.db_table
+    items = OrderItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {pairs} (product_id, other_id, orders)
+            SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id)
+            FROM {items} a
+            JOIN {items} b ON b.order_id = a.order_id
+            WHERE a.order_id > %s AND a.order_id <= %s
+            GROUP BY a.product_id, b.product_id
+            ON CONFLICT (product_id, other_id)
+            DO UPDATE SET orders = {pairs}.orders + excluded.orders
+            """,
+            [first_order_id, last_order_id],
+        )
+
+
+def _refresh_neighbors(product_ids, top_n):
+    """Recompute the stored top-N lists for ``product_ids``.
+
+    Score is the share of the product's orders that also contained the
+    neighbour, i.e. P(neighbour | product).
+    """
+    pairs = {}
+    own = {}
+    for product_id, other_id, orders in ProductPairCount.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'other_id', 'orders'):
+        if product_id == other_id:
+            own[product_id] = orders
+        else:
+            pairs.setdefault(product_id, []).append((other_id, orders))
+
+    rows = []
+    for product_id, others in pairs.items():
+        total = own.get(product_id) or 1
+        others.sort(key=lambda pair: (-pair[1], pair[0]))
+        rows.extend(
+            ProductNeighbor(
+                product_id=product_id, neighbor_id=other_id,
+                rank=rank, score=orders / total
+            )
+            for rank, (other_id, orders) in enumerate(others[:top_n])
+        )
+
+    ProductNeighbor.objects.filter(product_id__in=product_ids).delete()
+    ProductNeighbor.objects.bulk_create(rows)
+    return len(rows)
+
+
+def update_recommendations(top_n=TOP_N, batch_size=1000):
+    """Fold orders placed since the last run into the neighbour tables.
+
+    Orders are consumed in id order, ``batch_size`` at a time, each batch
+    in its own transaction together with the checkpoint so a crash never
+    double counts. Each batch first moves the checkpoint with a
+    conditional UPDATE, so when two runs overlap the one that read a
+    stale checkpoint stops instead of counting the batch again. Only
+    products appearing in the new orders have their neighbour lists
+    recomputed. Returns (orders processed, products refreshed).
+    """
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    newest = Order.objects.aggregate(newest=Max('id'))['newest'] or 0
+
+    orders_done = products_done = 0
+    while checkpoint.last_id < newest:
+        order_ids = list(
+            Order.objects.filter(id__gt=checkpoint.last_id, id__lte=newest)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            break
+        first, last = checkpoint.last_id, order_ids[-1]
+        with transaction.atomic():
+            claimed = JobCheckpoint.objects.filter(name=CHECKPOINT, last_id=first).update(
+                last_id=last, updated_at=timezone.now()
+            )
+            if not claimed:
+                # Another run has moved the checkpoint since we read it
+                break
+            _count_pairs(first, last)
+            product_ids = list(
+                OrderItem.objects.filter(order_id__gt=first, order_id__lte=last)
+                .values_list('product_id', flat=True).distinct()
+            )
+            for start in range(0, len(product_ids), 500):
+                _refresh_neighbors(product_ids[start:start + 500], top_n)
+        checkpoint.last_id = last
+        orders_done += len(order_ids)
+        products_done += len(product_ids)
+
+    return orders_done, products_done
+
+
+def rebuild_recommendations(top_n=TOP_N, batch_size=1000):
+    """Throw away all counts and recompute from the full order history"""
+    with transaction.atomic():
+        ProductNeighbor.objects.all().delete()
+        ProductPairCount.objects.all().delete()
+        JobCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={'last_id': 0})
+    return update_recommendations(top_n=top_n, batch_size=batch_size)
+
+
+def _related_query(product, limit):
+    return (
+        Product.objects.filter(neighbor_of__product=product, stock__gt=0)
+        .order_by('neighbor_of__rank')[:limit]
+    )
+
+
+def related_products(product, limit=4):
+    """In-stock neighbours of ``product``, best first, in one indexed query"""
+    return list(_related_query(product, limit))
+
+
+async def arelated_products(product, limit=4):
+    """related_products() for async views"""
+    return [related async for related in _related_query(product, limit)]
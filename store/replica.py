@@ -0,0 +1,160 @@
+"""Read replica routing for catalog and order-history reads.
+
+With STORE_REPLICA_DATABASE set to a database alias, ReplicaRouter sends
+reads of the catalog and order-history models to it during web requests,
+so browsing doesn't compete with checkout writes on the primary. Reads
+stay on the primary when:
+
+- it isn't a request (management commands, the task worker), since those
+  often read what they just wrote or what was just committed;
+- the primary is inside a transaction, so a transaction reads what it writes;
+- the request has written catalog or order data (or stock reservations,
+  which change what the catalog shows as available), or isn't a
+  GET/HEAD/OPTIONS, for the rest of the request (read-your-writes). Cart
+  and session writes don't count: nothing read from the replica shows them;
+- a cookie says this client wrote within the last STORE_REPLICA_PIN_SECONDS,
+  which covers the redirect after a form post while the replica catches up.
+"""
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_pinned'
+
+# Models whose reads may be served from the replica
+REPLICA_MODELS = {
+    'store.product',
+    'store.productneighbor',
+    'store.order',
+    'store.orderitem',
+}
+
+# Writes that change what reads of REPLICA_MODELS return
+PIN_MODELS = REPLICA_MODELS | {'store.stockreservation'}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    """Per-request routing flags; mutated in place so copies of the context see changes"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+current_state = ContextVar('store_replica_routing', default=None)
+
+
+def replica_alias():
+    return getattr(settings, 'STORE_REPLICA_DATABASE', None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = replica_alias()
+        state = current_state.get()
+        if not replica or state is None or state.pinned:
+            return None
+        if model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        # Related objects come from wherever their parent row was read
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None and model._meta.label_lower in PIN_MODELS:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary (sync_replica), never migrated itself
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Start each request's routing state and keep writers on the primary for a while"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        state = RoutingState(
+            pinned=request.method not in SAFE_METHODS or pinned_until > time.time()
+        )
+        return state, current_state.set(state)
+
+    def finish(self, state, response):
+        if state.wrote and replica_alias():
+            seconds = settings.STORE_REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
+
+
+def copy_database(source, target_path, pages=1024):
+    """Copy the ``source`` connection's SQLite database into ``target_path``.
+
+    Uses SQLite's online backup, so the primary stays writable and readers
+    of the target see either the old copy or the new one, never a mix.
+    Returns the number of pages copied.
+    """
+    source.ensure_connection()
+    copied = 0
+
+    def progress(status, remaining, total):
+        nonlocal copied
+        copied = total
+
+    target = sqlite3.connect(target_path)
+    try:
+        source.connection.backup(target, pages=pages, progress=progress)
+    finally:
+        target.close()
+    return copied
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+class OutOfStock(Exception):
+    """Raised when one or more cart lines cannot be fulfilled.
+
+    ``lines`` is a list of (cart_item, available) pairs, one per failing
+    line, in product id order.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__(', '.join(
+            f'{item.product.name} (wanted {item.quantity}, {available} left)'
+            for item, available in lines
+        ))
+
+
+def reservation_ttl():
+    return timedelta(seconds=settings.STORE_RESERVATION_TTL)
+
+
+def active_reservations():
+    return StockReservation.objects.filter(expires_at__gt=timezone.now())
+
+
+def holds_reservations(cart, lines):
+    """True if ``cart`` has unexpired holds matching ``lines`` exactly"""
+    held = dict(active_reservations().filter(cart=cart).values_list('product_id', 'quantity'))
+    return held == {item.product_id: item.quantity for item in lines}
+
+
+def reserve_cart(cart, lines=None, ttl=None):
+    """Hold stock for every line of ``cart`` and return the expiry time.
+
+    Replaces the cart's previous holds. Availability is stock minus other
+    carts' unexpired holds; if any line comes up short OutOfStock is
+    raised and nothing is held. Expired holds on the same products are
+    cleared on the way.
+    """
+    if lines is None:
+        lines = list(cart.items.select_related('product').order_by('product_id'))
+    product_ids = [item.product_id for item in lines]
+    now = timezone.now()
+    expires_at = now + (ttl or reservation_ttl())
+
+    with transaction.atomic():
+        # Writing first takes the database write lock on SQLite, so the
+        # availability read below can't race another reservation
+        StockReservation.objects.filter(
+            Q(cart=cart) | Q(product_id__in=product_ids, expires_at__lte=now)
+        ).delete()
+        available = dict(
+            Product.objects.select_for_update().with_available()
+            .filter(pk__in=product_ids).values_list('pk', 'available')
+        )
+        short = [
+            (item, max(available.get(item.product_id, 0), 0))
+            for item in lines
+            if available.get(item.product_id, 0) < item.quantity
+        ]
+        if short:
+            raise OutOfStock(short)
+        StockReservation.objects.bulk_create([
+            StockReservation(cart=cart, product_id=item.product_id,
+                             quantity=item.quantity, expires_at=expires_at)
+            for item in lines
+        ])
+    return expires_at
+
+
+def release_cart(cart):
+    StockReservation.objects.filter(cart=cart).delete()
+
+
+def sweep_expired(chunk_size=1000):
+    """Delete expired holds in chunks. Returns the number deleted."""
+    total = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=timezone.now())
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return total
+        deleted, _ = StockReservation.objects.filter(id__in=ids, expires_at__lte=timezone.now()).delete()
+        total += deleted
@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+# SQLite FTS5 table mirroring Product.name / Product.description.
+# rowid is the Product id so a match joins straight back to store_product.
+FTS_TABLE = 'store_product_fts'
+
+# Matches in the name count for more than matches in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled(conn=None):
+    """Full-text index is only available on SQLite (FTS5)"""
+    return (conn or connection).vendor == 'sqlite'
+
+
+def create_index(schema_editor):
+    """Create the FTS5 table if the backend supports it"""
+    if not fts_enabled(schema_editor.connection):
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        "USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_index(schema_editor):
+    if not fts_enabled(schema_editor.connection):
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def parse_query(query):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every term is quoted (so user input can never inject FTS syntax) and
+    prefix-matched, and all terms must be present: "wire head" matches
+    "Wireless Bluetooth Headphones".
+    """
+    terms = TERM_RE.findall(query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_product(product):
+    """Add or refresh a single product in the index"""
+    index_products([product])
+
+
+def index_products(products):
+    """Add or refresh a batch of products (e.g. after bulk_create)"""
+    if not fts_enabled():
+        return
+    rows = [(p.pk, p.name, p.description) for p in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows]
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def remove_product(product_id):
+    """Drop a product from the index"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def rebuild_index():
+    """Rebuild the whole index from the Product table. Returns the row count."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+            "SELECT id, name, description FROM store_product"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search_products(queryset, query):
+    """Filter a Product queryset down to matches for ``query``, best match first.
+
+    On SQLite this joins against the FTS5 index and orders by bm25 rank
+    (exposed as ``search_rank``, lower is better). Other backends fall back
+    to per-term icontains filtering, newest first.
+    """
+    match = parse_query(query)
+    if not match:
+        return queryset
+
+    if not fts_enabled():
+        for term in TERM_RE.findall(query):
+            queryset = queryset.filter(
+                Q(name__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset.order_by('-created_at', '-id')
+
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = store_product.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[match],
+        select={
+            'search_rank': f'bm25({FTS_TABLE}, %s, %s)',
+        },
+        select_params=[NAME_WEIGHT, DESCRIPTION_WEIGHT],
+    ).order_by('search_rank', '-created_at', '-id')
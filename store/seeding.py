@@ -0,0 +1,132 @@
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import search
+from .cache import bump_catalog_version
+from .models import Product, Cart, CartItem, Order, OrderItem
+
+ADJECTIVES = [
+    'Wireless', 'Premium', 'Compact', 'Ergonomic', 'Smart', 'Portable', 'Gaming',
+    'Ultra', 'Classic', 'Pro', 'Mini', 'Rugged', 'Silent', 'Fast', 'Eco',
+]
+NOUNS = [
+    'Headphones', 'Keyboard', 'Mouse', 'Monitor', 'Chair', 'Charger', 'Speaker',
+    'Webcam', 'Laptop', 'Tablet', 'Watch', 'Earbuds', 'Router', 'Backpack', 'Lamp',
+]
+FEATURES = [
+    'long battery life', 'noise cancellation', 'RGB lighting', 'USB-C charging',
+    'aluminium frame', 'two-year warranty', 'water resistance', 'fast shipping',
+    'low latency', 'adjustable height', 'premium materials', 'bluetooth 5.3',
+]
+
+# Every seeded user gets the same password, hashed once
+SEED_PASSWORD = 'seed-password'
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def seed_store(products=0, users=0, carts=0, orders=0, batch_size=1000,
+               seed=None, log=None):
+    """Bulk-generate catalog, users, carts and orders.
+
+    Everything is written with batched bulk_create; orders reuse the
+    existing catalog and user pool (plus anything created here). Returns
+    a dict of row counts created per model.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    run = uuid.uuid4().hex[:6]
+    created = {}
+
+    new_products = [
+        Product(
+            sku=f'SD-{run}-{i}',
+            name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {run}-{i}',
+            description=f'{rng.choice(ADJECTIVES)} design with '
+                        f'{", ".join(rng.sample(FEATURES, 3))}.',
+            price=Decimal(rng.randrange(500, 100000)) / 100,
+            stock=0 if rng.random() < 0.1 else rng.randrange(1, 500),
+        )
+        for i in range(products)
+    ]
+    for batch in _chunks(new_products, batch_size):
+        with transaction.atomic():
+            Product.objects.bulk_create(batch)
+            search.index_products(batch)
+    if new_products:
+        bump_catalog_version()
+    created['products'] = len(new_products)
+    log(f'{len(new_products)} products')
+
+    password = make_password(SEED_PASSWORD)
+    new_users = [
+        User(username=f'seed_{run}_{i}', email=f'seed_{run}_{i}@example.com', password=password)
+        for i in range(users)
+    ]
+    for batch in _chunks(new_users, batch_size):
+        User.objects.bulk_create(batch)
+    created['users'] = len(new_users)
+    log(f'{len(new_users)} users')
+
+    product_pool = list(Product.objects.filter(stock__gt=0).values_list('id', 'price'))
+    user_ids = [u.id for u in new_users] or list(User.objects.values_list('id', flat=True))
+    if (carts or orders) and (not product_pool or not user_ids):
+        raise ValueError('Seeding carts or orders needs at least one in-stock product and one user')
+
+    cart_owners = rng.sample(user_ids, min(carts, len(user_ids)))
+    new_carts = [Cart(user_id=user_id) for user_id in cart_owners]
+    lines = 0
+    for batch in _chunks(new_carts, batch_size):
+        with transaction.atomic():
+            Cart.objects.bulk_create(batch)
+            items = []
+            for cart in batch:
+                for product_id, price in rng.sample(product_pool, min(rng.randint(1, 8), len(product_pool))):
+                    items.append(CartItem(cart=cart, product_id=product_id, quantity=rng.randint(1, 3)))
+            CartItem.objects.bulk_create(items)
+            lines += len(items)
+    created['carts'] = len(new_carts)
+    created['cart_items'] = lines
+    log(f'{len(new_carts)} carts, {lines} cart lines')
+
+    created['orders'] = created['order_items'] = 0
+    statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+    for start in range(0, orders, batch_size):
+        count = min(batch_size, orders - start)
+        baskets = [
+            rng.sample(product_pool, min(rng.randint(1, 5), len(product_pool)))
+            for _ in range(count)
+        ]
+        quantities = [[rng.randint(1, 3) for _ in basket] for basket in baskets]
+        batch = [
+            Order(
+                user_id=rng.choice(user_ids),
+                order_number=f'SD-{uuid.uuid4().hex[:16].upper()}',
+                total_amount=sum(price * qty for (_, price), qty in zip(basket, qtys)),
+                status=rng.choice(statuses),
+                shipping_address=f'{rng.randint(1, 999)} Seed Street',
+                phone_number=f'0300{rng.randint(1000000, 9999999)}',
+            )
+            for basket, qtys in zip(baskets, quantities)
+        ]
+        with transaction.atomic():
+            Order.objects.bulk_create(batch)
+            items = [
+                OrderItem(order=order, product_id=product_id, quantity=qty, price=price)
+                for order, basket, qtys in zip(batch, baskets, quantities)
+                for (product_id, price), qty in zip(basket, qtys)
+            ]
+            OrderItem.objects.bulk_create(items)
+        created['orders'] += len(batch)
+        created['order_items'] += len(items)
+        log(f'{created["orders"]}/{orders} orders')
+
+    return created
@@ -0,0 +1,48 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import search
+from .cache import bump_catalog_version
+from .carts import merge_into_user_cart
+from .catalog_io import default_sku
+from .images import generate_derivatives_safely
+from .models import Product, UserProfile
+
+
+@receiver(post_save, sender=Product)
+def assign_default_sku(sender, instance, **kwargs):
+    """Products made without a sku (admin, create()) still need one to export"""
+    if not instance.sku:
+        instance.sku = default_sku(instance.pk)
+        Product.objects.filter(pk=instance.pk, sku__isnull=True).update(sku=instance.sku)
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    """Keep the search index in step with product edits"""
+    search.index_product(instance)
+    if instance.image:
+        generate_derivatives_safely(instance.image)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=UserProfile)
+def build_profile_picture_sizes(sender, instance, **kwargs):
+    if instance.profile_picture:
+        generate_derivatives_safely(instance.profile_picture)
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """Carry an anonymous cookie cart over into the user's cart at login"""
+    session_cart = getattr(request, 'session_cart', None) if request else None
+    if session_cart:
+        merge_into_user_cart(session_cart, user)
@@ -0,0 +1,58 @@
+"""Static files storage that fingerprints and precompresses at collectstatic time.
+
+ManifestStaticFilesStorage renames every file to name.<hash>.ext (and
+rewrites the references inside CSS), so the URLs {% static %} produces
+change whenever the content does and can be cached forever. After that,
+each compressible file gets a .gz, and a .br when the optional brotli
+package is installed, written beside it. Neither a front-end server nor
+store.files.serve_static has to compress anything per request.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional: gzip variants only
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+}
+
+# Below this size the headers cost more than compression saves
+MIN_COMPRESS_SIZE = 256
+
+
+def compressed_variants(data):
+    """(suffix, bytes) for each encoding that actually makes ``data`` smaller"""
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    return [(suffix, packed) for suffix, packed in variants if len(packed) < len(data) * 0.95]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            self.compress(name)
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return []
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return []
+        written = []
+        for suffix, packed in compressed_variants(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(packed)
+            written.append(name + suffix)
+        return written
@@ -0,0 +1,60 @@
+import logging
+
+from django.conf import settings
+from django.core.mail import mail_admins, send_mail
+
+from .analytics import update_sales_rollups
+from .models import Order, Product
+from .queue import enqueue, task
+from .recommendations import update_recommendations
+
+logger = logging.getLogger('store.queue')
+
+
+@task('store.order_placed')
+def order_placed(order_id):
+    """Everything that follows a checkout, off the request path"""
+    order = Order.objects.select_related('user').prefetch_related('items').get(pk=order_id)
+    enqueue(send_order_confirmation, order_id=order.id)
+    enqueue(check_low_stock, product_ids=sorted({item.product_id for item in order.items.all()}))
+    enqueue(refresh_sales_rollups, unique=True)
+    enqueue(refresh_recommendations, unique=True)
+
+
+@task('store.send_order_confirmation')
+def send_order_confirmation(order_id):
+    order = Order.objects.select_related('user').prefetch_related('items__product').get(pk=order_id)
+    if not order.user.email:
+        return
+    lines = '\n'.join(
+        f'{item.quantity} x {item.product.name} @ PKR {item.price}' for item in order.items.all()
+    )
+    send_mail(
+        f'Order {order.order_number} confirmed',
+        f'Thanks for your order!\n\n{lines}\n\nTotal: PKR {order.total_amount}\n',
+        None,
+        [order.user.email],
+    )
+
+
+@task('store.check_low_stock')
+def check_low_stock(product_ids):
+    low = list(
+        Product.objects.filter(pk__in=product_ids, stock__lt=settings.STORE_LOW_STOCK_THRESHOLD)
+        .order_by('stock').values_list('name', 'stock')
+    )
+    if not low:
+        return
+    body = '\n'.join(f'{name}: {stock} left' for name, stock in low)
+    logger.warning('Low stock:\n%s', body)
+    mail_admins(f'{len(low)} products running low', body)
+
+
+@task('store.refresh_sales_rollups', max_attempts=3)
+def refresh_sales_rollups():
+    update_sales_rollups()
+
+
+@task('store.refresh_recommendations', max_attempts=3)
+def refresh_recommendations():
+    update_recommendations()
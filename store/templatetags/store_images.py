@@ -0,0 +1,59 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from store.images import SIZES, derivative_name
+
+register = template.Library()
+
+
+def _derivative_urls(field, size):
+    """(webp_url, jpg_url) for ``size``, or None if they haven't been built yet.
+
+    Derivatives are rebuilt in place (build_image_sizes --force), so the
+    URLs carry the JPEG's mtime, written after the WebP, as a version:
+    media is served with a far-future max-age and a rebuild must change
+    the URL for browsers to fetch it.
+    """
+    if size not in SIZES:
+        raise template.TemplateSyntaxError(
+            f"Unknown image size {size!r}; choose one of {', '.join(SIZES)}"
+        )
+    storage = field.storage
+    webp = derivative_name(field.name, size, 'webp')
+    jpg = derivative_name(field.name, size, 'jpg')
+    try:
+        version = int(storage.get_modified_time(jpg).timestamp())
+    except OSError:
+        return None
+    return f'{storage.url(webp)}?v={version}', f'{storage.url(jpg)}?v={version}'
+
+
+@register.simple_tag
+def image_url(field, size):
+    """URL of the ``size`` JPEG derivative, falling back to the original"""
+    if not field:
+        return ''
+    urls = _derivative_urls(field, size)
+    return urls[1] if urls else field.url
+
+
+@register.simple_tag
+def responsive_image(field, size, **attrs):
+    """<picture> with a WebP source and progressive JPEG fallback at ``size``.
+
+    Extra keyword arguments become <img> attributes, e.g.
+    {% responsive_image product.image 'card' alt=product.name class='card-img-top' %}
+    Falls back to a plain <img> of the original until derivatives exist.
+    """
+    if not field:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attr_html = format_html_join(' ', '{}="{}"', sorted(attrs.items()))
+    urls = _derivative_urls(field, size)
+    if urls is None:
+        return format_html('<img src="{}" {}>', field.url, attr_html)
+    webp, jpg = urls
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}"><img src="{}" {}></picture>',
+        webp, jpg, attr_html
+    )
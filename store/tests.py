@@ -1,3 +1,1796 @@
-from django.test import TestCase
+import copy
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.contrib.messages import get_messages
+from django.db import connection, connections, IntegrityError, OperationalError, transaction
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.conf import settings
+from django.test import (
+    AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template, engines
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import benchmarks
+from .benchmarks import AsgiBenchmark, RenderBenchmark, StoreBenchmark, use_async_views
+from .cache import catalog_cache_stats
+from .carts import SessionCart
+from .checks import check_replica_catalog_cache
+from .fetch import ImageFetcher, FetchStats
+from .management.commands import add_sample_products, fix_missing_images
+from .instrumentation import QueryBudgetExceeded, RequestMetrics
+from .images import SIZES, derivative_name, generate_derivatives_safely, has_derivatives
+from .models import (
+    Product, Cart, CartItem, Order, OrderItem, UserProfile, ProductNeighbor, ProductPairCount,
+    StockReservation, DailyProductSales, DailyStatusSales, JobCheckpoint, Task,
+)
+from . import async_views, files, queue, replica, views
+from .orders import place_order, OutOfStock
+from .pagination import ApproximateCountPaginator
+from .analytics import update_sales_rollups, rebuild_sales_rollups
+from .recommendations import update_recommendations, rebuild_recommendations
+from .replica import ReplicaRouter
+from .reservations import reserve_cart
+from .search import search_products, parse_query, FTS_TABLE
+from .seeding import seed_store
+
+
+def make_product(name, description='', price='10.00', stock=5):
+    return Product.objects.create(
+        name=name, description=description, price=Decimal(price), stock=stock
+    )
+
+
+def png_bytes(size=(600, 300), color=0):
+    buffer = BytesIO()
+    Image.new('RGB', size, (color, 100, 200)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(STORE_CATALOG_CACHE=None)
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.headphones = make_product(
+            'Wireless Bluetooth Headphones', 'Noise cancelling over-ear headphones.'
+        )
+        self.keyboard = make_product(
+            'Mechanical Keyboard', 'RGB keyboard, pairs with wireless headphones.'
+        )
+        self.chair = make_product('Gaming Chair', 'Ergonomic chair.')
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query))
+
+    def test_parse_query_quotes_and_prefixes_terms(self):
+        self.assertEqual(parse_query('Wire "head'), '"wire"* "head"*')
+        self.assertEqual(parse_query('  '), '')
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self.search('wire head'), [self.headphones, self.keyboard])
+        self.assertEqual(self.search('ergo'), [self.chair])
+        self.assertEqual(self.search('wireless chair'), [])
+
+    def test_name_matches_rank_first(self):
+        results = self.search('headphones')
+        self.assertEqual(results[0], self.headphones)
+
+    def test_index_follows_save_and_delete(self):
+        self.chair.name = 'Office Throne'
+        self.chair.save()
+        self.assertEqual(self.search('throne'), [self.chair])
+        self.assertEqual(self.search('gaming'), [])
+
+        self.chair.delete()
+        self.assertEqual(self.search('throne'), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        self.assertEqual(self.search('keyboard'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('keyboard'), [self.keyboard])
+
+    def test_product_list_search(self):
+        response = self.client.get(reverse('product_list'), {'search': 'mech key'})
+        self.assertEqual(list(response.context['page_obj']), [self.keyboard])
+
+
+@override_settings(STORE_CATALOG_CACHE=None)
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.products = [make_product(f'Product {i}', 'widget') for i in range(30)]
+        # Newest first, ties on created_at broken by id
+        self.expected = sorted(
+            self.products, key=lambda p: (p.created_at, p.id), reverse=True
+        )
+
+    def get_page(self, **params):
+        response = self.client.get(reverse('product_list'), params)
+        return response.context['page_obj']
+
+    def test_walks_every_product_forward_and_back(self):
+        seen, pages = [], []
+        page = self.get_page()
+        while True:
+            pages.append(page)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            page = self.get_page(cursor=page.next_cursor)
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        back = self.get_page(cursor=pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    def test_search_keeps_relevance_order(self):
+        mouse = make_product('Gaming Mouse', 'widget')
+        pad = make_product('Desk Pad', 'Fits any mouse')  # newer, weaker match
+        page = self.get_page(search='mouse')
+        self.assertEqual(list(page), [mouse, pad])
+        self.assertEqual(page.number, 1)
+
+        page = self.get_page(search='widget', page=3)
+        self.assertEqual(len(page), 7)
+        self.assertEqual(page.paginator.count, 31)
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        page = self.get_page(cursor='not-a-token')
+        self.assertEqual(list(page), self.expected[:12])
+
+    def test_no_count_query(self):
+        first = self.get_page()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('product_list'), {'cursor': first.next_cursor})
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+        self.product = make_product('Smart Watch', 'GPS watch')
+
+    def test_second_anonymous_hit_is_served_from_cache(self):
+        url = reverse('product_detail', args=[self.product.id])
+        first = self.client.get(url)
+        self.assertEqual(first['X-Catalog-Cache'], 'miss')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Catalog-Cache'], 'hit')
+        self.assertContains(second, 'Smart Watch')
+
+        stats = catalog_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('product_list')
+        self.client.get(url, {'search': 'watch'})
+        response = self.client.get(url, {'search': 'phone'})
+        self.assertEqual(response['X-Catalog-Cache'], 'miss')
+
+    def test_product_save_invalidates(self):
+        url = reverse('product_detail', args=[self.product.id])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Smarter Watch'
+            self.product.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Catalog-Cache'], 'miss')
+        self.assertContains(response, 'Smarter Watch')
+
+    def test_cached_forms_get_a_fresh_csrf_token(self):
+        url = reverse('home')
+        Client().get(url)
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(url)
+        self.assertEqual(response['X-Catalog-Cache'], 'hit')
+        self.assertNotContains(response, '__catalog_csrf_token__')
+
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()
+        ).group(1)
+        response = client.post(
+            reverse('add_to_cart', args=[self.product.id]),
+            {'quantity': 1, 'csrfmiddlewaretoken': token},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_logged_in_users_bypass_cache(self):
+        user = User.objects.create_user('buyer', password='pw')
+        self.client.force_login(user)
+        url = reverse('home')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertNotIn('X-Catalog-Cache', response)
+
+
+class OrderQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pw')
+        self.client.force_login(self.user)
+        self.products = [make_product(f'Item {i}') for i in range(5)]
+
+    def make_orders(self, count):
+        start = Order.objects.count()
+        for n in range(start, start + count):
+            order = Order.objects.create(
+                user=self.user, order_number=f'ORD-{n:06d}', total_amount=Decimal('50.00'),
+                shipping_address='1 Main St', phone_number='555'
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=p, quantity=1, price=p.price)
+                for p in self.products
+            )
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_order_history_query_count_is_flat(self):
+        self.make_orders(2)
+        few = self.count_queries(reverse('order_history'))
+        self.make_orders(40)
+        many = self.count_queries(reverse('order_history'))
+        self.assertEqual(few, many)
+        # session, user, COUNT for the paginator, orders, items + products
+        self.assertEqual(many, 5)
+
+    def test_order_history_is_paginated(self):
+        self.make_orders(25)
+        response = self.client.get(reverse('order_history'), {'page': 3})
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page[0].item_count, 5)
+        self.assertContains(response, '+2 more items')
+
+    def test_order_detail_query_count_is_flat(self):
+        order = self.make_orders(1)
+        url = reverse('order_detail', args=[order.id])
+        few = self.count_queries(url)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=make_product(f'Extra {i}'), quantity=2, price=1)
+            for i in range(20)
+        )
+        self.assertEqual(self.count_queries(url), few)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pw')
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def checkout(self):
+        return self.client.post(reverse('checkout'), {
+            'shipping_address': '1 Main St', 'phone_number': '555'
+        })
+
+    def test_checkout_decrements_stock_and_bulk_creates_items(self):
+        a, b = make_product('A', stock=5), make_product('B', stock=2)
+        CartItem.objects.create(cart=self.cart, product=a, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=b, quantity=2)
+
+        response = self.checkout()
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('order_confirmation', args=[order.id]))
+        self.assertEqual(order.total_amount, Decimal('50.00'))
+        self.assertEqual(order.items.count(), 2)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.stock, b.stock), (2, 0))
+        self.assertFalse(Cart.objects.filter(pk=self.cart.pk).exists())
+
+    def test_short_lines_are_reported_and_nothing_is_taken(self):
+        a = make_product('Plenty', stock=10)
+        b = make_product('Scarce', stock=1)
+        c = make_product('Gone', stock=0)
+        for product in (a, b, c):
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+        with self.assertRaises(OutOfStock) as ctx:
+            place_order(self.user, self.cart, 'addr', '555')
+        self.assertEqual(
+            [(item.product_id, available) for item, available in ctx.exception.lines],
+            [(b.id, 1), (c.id, 0)]
+        )
+        a.refresh_from_db()
+        self.assertEqual(a.stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+        response = self.checkout()
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        errors = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertEqual(len(errors), 2)
+        self.assertIn('Only 1 of Scarce', errors[0])
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    BUYERS = 12
+    STOCK = 5
+
+    def test_parallel_checkouts_never_oversell(self):
+        product = make_product('Flash Sale', stock=self.STOCK)
+        carts = []
+        for n in range(self.BUYERS):
+            user = User.objects.create(username=f'buyer{n}')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            carts.append((user, cart))
+
+        barrier = threading.Barrier(self.BUYERS)
+        results = []
+
+        def buy(user, cart):
+            try:
+                barrier.wait()
+                for attempt in range(50):
+                    try:
+                        place_order(user, cart, 'addr', '555')
+                        results.append('ok')
+                        return
+                    except OutOfStock:
+                        results.append('short')
+                        return
+                    except OperationalError:
+                        # SQLite reports write contention as "locked"; retry
+                        time.sleep(0.01)
+                results.append('gave up')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy, args=args) for args in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count('ok'), self.STOCK)
+        self.assertEqual(results.count('short'), self.BUYERS - self.STOCK)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(
+            OrderItem.objects.filter(product=product).count(), self.STOCK
+        )
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+        self.a = make_product('A', price='2.50', stock=10)
+        self.b = make_product('B', price='10.00', stock=10)
+
+    def add(self, product, quantity):
+        return self.client.post(reverse('add_to_cart', args=[product.id]), {'quantity': quantity})
+
+    def test_summary_is_one_aggregate_query(self):
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=self.a, quantity=3)
+        CartItem.objects.create(cart=cart, product=self.b, quantity=2)
+        with self.assertNumQueries(1):
+            summary = cart.summary()
+        self.assertEqual(summary, {'item_count': 5, 'subtotal': Decimal('27.50')})
+        self.assertEqual(Cart.objects.create().summary()['subtotal'], 0)
+
+    def test_cart_views_keep_denormalized_totals_current(self):
+        self.client.force_login(User.objects.create(username='shopper'))
+        self.add(self.a, 2)
+        self.add(self.b, 1)
+        cart = Cart.objects.get()
+        self.assertEqual((cart.item_count, cart.subtotal), (3, Decimal('15.00')))
+
+        b_line = cart.items.get(product=self.b)
+        self.client.post(reverse('update_cart_item', args=[b_line.id]), {'quantity': 3})
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.subtotal), (5, Decimal('35.00')))
+
+        self.client.post(reverse('remove_from_cart', args=[b_line.id]))
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.subtotal), (2, Decimal('5.00')))
+
+    def test_view_cart_query_count_does_not_grow_with_lines(self):
+        self.add(self.a, 1)
+        url = reverse('view_cart')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for i in range(20):
+            self.add(make_product(f'Extra {i}'), 1)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(response.context['total'], Decimal('202.50'))
+
+    def test_badge_reads_count_from_session(self):
+        self.add(self.a, 4)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['cart_count'], 4)
+        self.assertNotIn('X-Catalog-Cache', response)
+
+
+class ImageServer:
+    """Local HTTP stand-in for the image CDN.
+
+    /ok/<name> returns a small PNG, /flaky/<name> fails with 503 on its
+    first request, /missing/<name> always 404s.
+    """
+
+    def __init__(self):
+        self.hits = Counter()
+        hits = self.hits
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                hits[self.path] += 1
+                kind = self.path.split('/')[1]
+                if kind == 'missing' or (kind == 'flaky' and hits[self.path] == 1):
+                    status, body = (404 if kind == 'missing' else 503), b''
+                else:
+                    status, body = 200, png_bytes(color=len(self.path))
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ImageFetchTests(TestCase):
+    def setUp(self):
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def test_fetcher_retries_and_dedupes(self):
+        fetcher = ImageFetcher(workers=4, retries=2, backoff=0.01)
+        urls = [self.server.url(p) for p in ('/ok/a', '/ok/a', '/flaky/b', '/missing/c')]
+        stats = FetchStats()
+        results = {}
+        for result in fetcher.fetch_all(urls):
+            stats.add(result)
+            results[result.url] = result
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[self.server.url('/ok/a')].content, png_bytes(color=len('/ok/a')))
+        self.assertEqual(results[self.server.url('/flaky/b')].attempts, 2)
+        self.assertEqual(results[self.server.url('/missing/c')].attempts, 1)
+        self.assertEqual((stats.ok, stats.failed, stats.retries), (2, 1, 1))
+
+    def test_fix_missing_images_command(self):
+        make_product('Gaming Mouse')
+        make_product('Office Mouse')
+        make_product('Mystery Box')
+        urls = {'mouse': self.server.url('/ok/mouse'), 'default': self.server.url('/flaky/default')}
+        out = StringIO()
+        threads = []
+
+        def record_thread(field):
+            threads.append(threading.current_thread())
+            return generate_derivatives_safely(field)
+
+        with mock.patch.dict(fix_missing_images.IMAGE_URLS, urls), \
+                mock.patch('store.fetch.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as pools, \
+                mock.patch('store.management.commands._images.generate_derivatives_safely', record_thread):
+            call_command('fix_missing_images', '--workers=3', '--batch-size=2', stdout=out)
+
+        self.assertFalse(Product.objects.filter(image='').exists())
+        self.assertEqual(self.server.hits['/ok/mouse'], 1)
+        with Product.objects.get(name='Mystery Box').image.open() as f:
+            self.assertEqual(f.read(), png_bytes(color=len('/flaky/default')))
+        # Two batches share one pool, which also saved the files, and one summary
+        self.assertEqual(pools.call_count, 1)
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+        self.assertEqual(out.getvalue().count('req/s'), 1)
+
+    def test_add_sample_products_command(self):
+        data = [
+            {**item, 'image_url': self.server.url(f'/ok/{n}')}
+            for n, item in enumerate(add_sample_products.PRODUCTS_DATA[:3])
+        ]
+        make_product(data[0]['name'])
+        with mock.patch.object(add_sample_products, 'PRODUCTS_DATA', data):
+            call_command('add_sample_products', '--workers=2', stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertFalse(Product.objects.filter(image='').exists())
+        self.assertEqual(
+            list(search_products(Product.objects.all(), data[2]['name'])),
+            [Product.objects.get(name=data[2]['name'])]
+        )
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def make_product_with_image(self, name='Camera'):
+        product = make_product(name)
+        product.image.save(f'{name}.png', ContentFile(png_bytes()))
+        return product
+
+    def test_saving_product_builds_every_size(self):
+        product = self.make_product_with_image()
+        storage = product.image.storage
+        for size, box in SIZES.items():
+            for fmt in ('webp', 'jpg'):
+                name = derivative_name(product.image.name, size, fmt)
+                with storage.open(name) as f:
+                    img = Image.open(f)
+                    self.assertEqual(max(img.size), min(box, 600))
+        with storage.open(derivative_name(product.image.name, 'card', 'jpg')) as f:
+            self.assertTrue(Image.open(f).info.get('progressive'))
+
+    def test_profile_picture_gets_derivatives(self):
+        user = User.objects.create(username='pic')
+        profile = UserProfile.objects.create(user=user)
+        profile.profile_picture.save('me.png', ContentFile(png_bytes((300, 300))))
+        self.assertTrue(has_derivatives(profile.profile_picture))
+
+    def test_template_tag_picks_size_and_falls_back(self):
+        product = self.make_product_with_image()
+        rendered = Template(
+            "{% load store_images %}{% responsive_image p.image 'thumb' alt=p.name %}"
+        ).render(Context({'p': product}))
+        self.assertIn('-thumb.webp?v=', rendered)
+        self.assertIn('-thumb.jpg?v=', rendered)
+        self.assertIn('alt="Camera"', rendered)
+
+        # A rebuild in place gets a new URL, so long-cached copies aren't reused
+        jpg = derivative_name(product.image.name, 'thumb', 'jpg')
+        later = time.time() + 60
+        os.utime(product.image.storage.path(jpg), (later, later))
+        self.assertNotEqual(Template(
+            "{% load store_images %}{% responsive_image p.image 'thumb' alt=p.name %}"
+        ).render(Context({'p': product})), rendered)
+
+        for name in [derivative_name(product.image.name, 'thumb', fmt) for fmt in ('webp', 'jpg')]:
+            product.image.storage.delete(name)
+        rendered = Template(
+            "{% load store_images %}{% image_url p.image 'thumb' %}"
+        ).render(Context({'p': product}))
+        self.assertEqual(rendered, product.image.url)
+
+    def test_backfill_command(self):
+        product = self.make_product_with_image()
+        storage = product.image.storage
+        storage.delete(derivative_name(product.image.name, 'detail', 'webp'))
+        self.assertFalse(has_derivatives(product.image))
+
+        out = StringIO()
+        call_command('build_image_sizes', '--workers=2', stdout=out)
+        self.assertTrue(has_derivatives(product.image))
+        self.assertIn('Built 1 images', out.getvalue())
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.camera, self.lens, self.bag, self.tripod = (
+            make_product(name) for name in ('Camera', 'Lens', 'Bag', 'Tripod')
+        )
+
+    def order(self, *products):
+        order = Order.objects.create(
+            user=self.user, order_number=f'ORD-{Order.objects.count():06d}',
+            total_amount=Decimal('1.00'), shipping_address='x', phone_number='1'
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=p, quantity=1, price=p.price) for p in products
+        )
+
+    def neighbors(self, product):
+        return [
+            (n.neighbor, round(n.score, 2))
+            for n in ProductNeighbor.objects.filter(product=product).select_related('neighbor')
+        ]
+
+    def test_scores_and_incremental_updates(self):
+        self.order(self.camera, self.lens)
+        self.order(self.camera, self.lens, self.bag)
+        self.order(self.camera)
+        self.assertEqual(update_recommendations(), (3, 3))
+        self.assertEqual(self.neighbors(self.camera), [(self.lens, 0.67), (self.bag, 0.33)])
+        self.assertEqual(self.neighbors(self.bag), [(self.camera, 1.0), (self.lens, 1.0)])
+
+        # Nothing new: nothing to do
+        self.assertEqual(update_recommendations(), (0, 0))
+
+        self.order(self.camera, self.tripod)
+        self.order(self.camera, self.tripod)
+        self.assertEqual(update_recommendations(batch_size=1), (2, 4))
+        self.assertEqual(
+            [n for n, _ in self.neighbors(self.camera)], [self.lens, self.tripod, self.bag]
+        )
+        # Lens wasn't in the new orders, so its list was left alone
+        self.assertEqual(self.neighbors(self.lens), [(self.camera, 1.0), (self.bag, 0.5)])
+
+        counts = list(ProductPairCount.objects.order_by('product', 'other').values_list('orders', flat=True))
+        rebuild_recommendations()
+        self.assertEqual(
+            list(ProductPairCount.objects.order_by('product', 'other').values_list('orders', flat=True)),
+            counts
+        )
+
+    def test_overlapping_run_does_not_count_twice(self):
+        self.order(self.camera, self.lens)
+        self.order(self.camera, self.bag)
+        # A second run read the checkpoint before this one committed
+        stale = JobCheckpoint(name='recommendations', last_id=0)
+        update_recommendations(batch_size=1)
+        counts = list(ProductPairCount.objects.order_by('product', 'other').values_list('orders', flat=True))
+
+        with mock.patch.object(JobCheckpoint.objects, 'get_or_create', return_value=(stale, False)):
+            self.assertEqual(update_recommendations(batch_size=1), (0, 0))
+        self.assertEqual(
+            list(ProductPairCount.objects.order_by('product', 'other').values_list('orders', flat=True)),
+            counts
+        )
+
+    @override_settings(STORE_CATALOG_CACHE=None)
+    def test_detail_page_uses_precomputed_neighbors(self):
+        self.order(self.camera, self.bag)
+        update_recommendations()
+        url = reverse('product_detail', args=[self.camera.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(list(response.context['related_products']), [self.bag])
+
+        # No history yet: fall back to other in-stock products
+        response = self.client.get(reverse('product_detail', args=[self.tripod.id]))
+        self.assertEqual(len(response.context['related_products']), 3)
+
+
+class SeedingAndBenchmarkTests(TestCase):
+    def test_seed_store_bulk_creates_everything(self):
+        out = StringIO()
+        call_command('seed_store', '--products=40', '--users=6', '--carts=3',
+                     '--orders=25', '--batch-size=10', '--seed=1', stdout=out)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertEqual(Order.objects.count(), 25)
+        self.assertTrue(CartItem.objects.exists())
+        order = Order.objects.prefetch_related('items').first()
+        self.assertEqual(order.total_amount, sum(i.price * i.quantity for i in order.items.all()))
+        # Seeded products are searchable
+        name = Product.objects.first().name
+        self.assertIn(Product.objects.first(), search_products(Product.objects.all(), name))
+
+    @override_settings(STORE_CATALOG_CACHE=None)
+    def test_benchmark_reports_every_scenario(self):
+        seed_store(products=30, users=3, orders=10, seed=2)
+        results = StoreBenchmark(iterations=3).run()
+        self.assertEqual(
+            set(results),
+            {'product_list_search', 'product_detail', 'view_cart', 'checkout', 'order_history'}
+        )
+        for result in results.values():
+            self.assertGreater(result['throughput_rps'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+        data = benchmarks.report(results)
+        slower = json.loads(json.dumps(data))
+        slower['results']['view_cart']['queries_per_request'] += 5
+        self.assertEqual(benchmarks.compare(data, data), [])
+        self.assertEqual(len(benchmarks.compare(slower, data)), 1)
+
+
+@override_settings(STORE_CATALOG_CACHE=None, STORE_QUERY_BUDGET_STRICT=True,
+                   STORE_QUERY_METRICS_HEADERS=True)
+class QueryBudgetTests(TestCase):
+    """Every store view stays within its STORE_QUERY_BUDGETS entry"""
+
+    def setUp(self):
+        seed_store(products=30, users=2, orders=0, seed=3)
+        self.user = User.objects.create(username='budget')
+        self.client.force_login(self.user)
+        self.product = Product.objects.filter(stock__gt=0).first()
+
+    def test_views_stay_within_budget(self):
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        for url in (reverse('home'), reverse('product_list') + '?search=pro',
+                    reverse('product_detail', args=[self.product.id]),
+                    reverse('view_cart'), reverse('checkout')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+        response = self.client.post(reverse('checkout'), {
+            'shipping_address': 'x', 'phone_number': '1'
+        })
+        order = Order.objects.get()
+        for url in (response.url, reverse('order_history'),
+                    reverse('order_detail', args=[order.id])):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+        for url in (reverse('api_product_list'), reverse('api_product_search') + '?q=pro&page=2&limit=2',
+                    reverse('api_product_detail', args=[self.product.id])):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    def test_metrics_headers_and_log(self):
+        with self.assertLogs('store.requests', 'INFO') as logs:
+            response = self.client.get(reverse('product_detail', args=[self.product.id]))
+        # session, user, product, neighbours, fallback related products
+        self.assertEqual(int(response['X-Query-Count']), 5)
+        self.assertIn('render;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'product_detail')
+        self.assertEqual(record['queries'], 5)
+        self.assertGreater(record['render_ms'], 0)
+
+    def test_over_budget_raises_in_strict_mode(self):
+        with override_settings(STORE_QUERY_BUDGETS={'home': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('home'))
+
+    def test_duplicates_are_counted(self):
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics):
+            for _ in range(3):
+                Product.objects.filter(pk=self.product.pk).first()
+            Product.objects.filter(pk=-1).first()
+        summary = metrics.summary()
+        self.assertEqual((summary['queries'], summary['duplicate_queries'],
+                          summary['similar_queries']), (4, 2, 3))
+
+
+class CatalogImportExportTests(TestCase):
+    def write(self, content, suffix):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_import_upserts_on_sku(self):
+        Product.objects.create(sku='A-1', name='Old name', description='', price=1, stock=1)
+        path = self.write(
+            'sku,name,description,price,stock\n'
+            'A-1,Renamed,desc,9.99,4\n'
+            'B-2,Brand new,desc,1.50,10\n'
+            'B-2,Brand new v2,desc,1.50,10\n'
+            ',No sku,desc,1,1\n'
+            'C-3,Bad price,desc,abc,1\n',
+            '.csv'
+        )
+        err = StringIO()
+        call_command('import_products', path, '--batch-size=2', stdout=StringIO(), stderr=err)
+
+        self.assertEqual(Product.objects.count(), 2)
+        a = Product.objects.get(sku='A-1')
+        self.assertEqual((a.name, a.price, a.stock), ('Renamed', Decimal('9.99'), 4))
+        self.assertEqual(Product.objects.get(sku='B-2').name, 'Brand new v2')
+        self.assertIn('line 5: missing sku', err.getvalue())
+        self.assertIn('line 6: bad price', err.getvalue())
+        self.assertEqual(list(search_products(Product.objects.all(), 'renamed')), [a])
+
+    def test_dry_run_prints_diff_and_writes_nothing(self):
+        Product.objects.create(sku='A-1', name='Lamp', description='', price=5, stock=1)
+        path = self.write(
+            '{"sku": "A-1", "name": "Lamp", "price": "6.00", "stock": 1}\n'
+            '{"sku": "Z-9", "name": "Desk", "price": "60", "stock": 2}\n',
+            '.jsonl'
+        )
+        out = StringIO()
+        call_command('import_products', path, '--dry-run', stdout=out, stderr=StringIO())
+        self.assertIn("~ A-1: price Decimal('5.00') -> Decimal('6.00')", out.getvalue())
+        self.assertIn('+ Z-9: Desk', out.getvalue())
+        self.assertIn('1 created, 1 updated', out.getvalue())
+        self.assertEqual(Product.objects.get(sku='A-1').price, Decimal('5.00'))
+        self.assertFalse(Product.objects.filter(sku='Z-9').exists())
+
+    def test_export_round_trips(self):
+        for i in range(5):
+            Product.objects.create(sku=f'S-{i}', name=f'Item, "{i}"', description='multi\nline',
+                                   price=Decimal('1.25') * i, stock=i)
+        for fmt in ('csv', 'jsonl'):
+            out = StringIO()
+            call_command('export_products', f'--format={fmt}', '--batch-size=2',
+                         stdout=out, stderr=StringIO())
+            path = self.write(out.getvalue(), f'.{fmt}')
+            result = StringIO()
+            call_command('import_products', path, '--dry-run', stdout=result, stderr=StringIO())
+            self.assertIn('0 created, 0 updated, 5 unchanged', result.getvalue())
+
+    def test_seeded_and_hand_made_products_round_trip(self):
+        seed_store(products=30, seed=1)
+        chair = make_product('Chair')
+        self.assertEqual(chair.sku, f'P{chair.id:06d}')
+        out = StringIO()
+        call_command('export_products', '--format=csv', stdout=out, stderr=StringIO())
+        path = self.write(out.getvalue(), '.csv')
+        result = StringIO()
+        call_command('import_products', path, stdout=result, stderr=StringIO())
+        self.assertIn('0 created, 0 updated, 31 unchanged, 0 errors', result.getvalue())
+
+
+class SessionCartTests(TestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+        self.a = make_product('A', price='2.00', stock=10)
+        self.b = make_product('B', price='5.00', stock=10)
+
+    def add(self, product, quantity):
+        return self.client.post(reverse('add_to_cart', args=[product.id]), {'quantity': quantity})
+
+    def test_anonymous_cart_never_touches_cart_or_session_tables(self):
+        self.add(self.a, 2)
+        self.add(self.b, 1)
+        self.add(self.a, 1)
+        response = self.client.get(reverse('view_cart'))
+
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(response.context['total'], Decimal('11.00'))
+        self.assertEqual(response.context['cart_count'], 4)
+
+        self.client.post(reverse('update_cart_item', args=[self.a.id]), {'quantity': 1})
+        self.client.post(reverse('remove_from_cart', args=[self.b.id]))
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual([(i.product, i.quantity) for i in response.context['cart_items']], [(self.a, 1)])
+
+    def test_growing_a_line_checks_stock(self):
+        self.add(self.a, 1)
+        self.client.post(reverse('update_cart_item', args=[self.a.id]), {'quantity': 3})
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual([i.quantity for i in response.context['cart_items']], [3])
+
+        self.client.post(reverse('update_cart_item', args=[self.a.id]), {'quantity': 11})
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual([i.quantity for i in response.context['cart_items']], [3])
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.a, 2)
+        self.client.cookies['cart'] = self.client.cookies['cart'].value + 'x'
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(list(response.context['cart_items']), [])
+
+    def test_login_merges_into_user_cart(self):
+        user = User.objects.create_user('merge', password='pw')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.a, quantity=3)
+
+        self.add(self.a, 2)
+        self.add(self.b, 1)
+        response = self.client.post(reverse('login'), {'username': 'merge', 'password': 'pw'})
+
+        self.assertEqual(
+            dict(cart.items.values_list('product__name', 'quantity')), {'A': 5, 'B': 1}
+        )
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.subtotal), (6, Decimal('15.00')))
+        # Cookie cart is dropped once merged
+        self.assertEqual(response.cookies['cart'].value, '')
+        self.assertEqual(self.client.get(reverse('view_cart')).context['cart_count'], 6)
+
+    @override_settings(STORE_ANONYMOUS_CART='database')
+    def test_database_mode_keeps_old_behaviour(self):
+        self.add(self.a, 1)
+        self.assertEqual(Cart.objects.get().session_key, self.client.session.session_key)
+
+
+class PurgeStaleCartsTests(TestCase):
+    def setUp(self):
+        self.product = make_product('A', price='5.00')
+        self.user = User.objects.create(username='keeper')
+        old = timezone.now() - timedelta(days=45)
+        self.stale = []
+        for i in range(5):
+            cart = Cart.objects.create(session_key=f'old-{i}')
+            CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+            self.stale.append(cart.id)
+        self.fresh = Cart.objects.create(session_key='fresh')
+        self.user_cart = Cart.objects.create(user=self.user)
+        Cart.objects.filter(id__in=self.stale + [self.user_cart.id]).update(updated_at=old)
+        Session.objects.create(session_key='expired', session_data='',
+                               expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='',
+                               expire_date=timezone.now() + timedelta(days=1))
+
+    def test_purges_in_chunks(self):
+        out = StringIO()
+        call_command('purge_stale_carts', '--chunk-size=2', '--sleep=0', stdout=out)
+        self.assertEqual(
+            set(Cart.objects.values_list('id', flat=True)), {self.fresh.id, self.user_cart.id}
+        )
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        # 3 chunks of carts, 1 of sessions
+        self.assertIn('Deleted 5 carts, 5 cart_items, 1 sessions in 4 chunks', out.getvalue())
+
+    def test_dry_run_and_options(self):
+        out = StringIO()
+        call_command('purge_stale_carts', '--dry-run', stdout=out)
+        self.assertIn('Would delete 5 carts (5 lines)', out.getvalue())
+        self.assertEqual(Cart.objects.count(), 7)
+
+        call_command('purge_stale_carts', '--include-user-carts', '--skip-sessions',
+                     '--chunk-size=3', '--max-chunks=1', '--sleep=0', stdout=StringIO())
+        self.assertEqual(Cart.objects.count(), 4)
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_cart_activity_keeps_it(self):
+        cart = Cart.objects.get(id=self.stale[0])
+        cart.add(self.product, 1)
+        cart.refresh_summary()
+        call_command('purge_stale_carts', '--sleep=0', stdout=StringIO())
+        self.assertTrue(Cart.objects.filter(id=cart.id).exists())
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.product = make_product('Flash', stock=3)
+        self.user = User.objects.create_user('first', password='pw')
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        self.other = User.objects.create(username='second')
+        self.other_cart = Cart.objects.create(user=self.other)
+
+    def available(self):
+        return Product.objects.with_available().get(pk=self.product.pk).available
+
+    def test_checkout_page_holds_stock_until_order(self):
+        response = self.client.get(reverse('checkout'))
+        self.assertContains(response, 'held for you until')
+        self.assertEqual(self.available(), 1)
+
+        CartItem.objects.create(cart=self.other_cart, product=self.product, quantity=2)
+        with self.assertRaises(OutOfStock) as ctx:
+            place_order(self.other, self.other_cart, 'addr', '555')
+        self.assertEqual(ctx.exception.lines[0][1], 1)
+
+        response = self.client.post(reverse('checkout'), {
+            'shipping_address': '1 Main St', 'phone_number': '555'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.available()), (1, 1))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_add_to_cart_respects_other_holds(self):
+        self.client.get(reverse('checkout'))
+        other = Client()
+        other.force_login(self.other)
+        other.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 2})
+        self.assertFalse(self.other_cart.items.exists())
+        other.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        self.assertEqual(self.other_cart.items.get().quantity, 1)
+
+    def test_expired_holds_stop_counting_and_are_swept(self):
+        reserve_cart(self.cart, ttl=timedelta(seconds=-1))
+        self.assertEqual(self.available(), 3)
+        CartItem.objects.create(cart=self.other_cart, product=self.product, quantity=3)
+        place_order(self.other, self.other_cart, 'addr', '555')
+
+        StockReservation.objects.create(cart=self.cart, product=self.product, quantity=1,
+                                        expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('sweep_reservations', stdout=out)
+        self.assertIn('Deleted 1 expired reservations', out.getvalue())
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+        self.products = [make_product(f'Widget {i}', stock=5) for i in range(5)]
+        make_product('Sold out', stock=0)
+
+    def test_list_pages_with_cursor_and_selects_fields(self):
+        response = self.client.get(reverse('api_product_list'), {'limit': 3, 'fields': 'id,name'})
+        data = response.json()
+        self.assertEqual([row['name'] for row in data['results']], ['Widget 4', 'Widget 3', 'Widget 2'])
+        self.assertEqual(set(data['results'][0]), {'id', 'name'})
+        self.assertIsNone(data['previous'])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual([row['name'] for row in data['results']], ['Widget 1', 'Widget 0'])
+        self.assertIsNone(data['next'])
+
+        response = self.client.get(reverse('api_product_list'), {'fields': 'name,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_and_detail(self):
+        make_product('Gadget', stock=1)
+        make_product('Gadget Case', 'Fits any gadget', stock=1)
+        data = self.client.get(reverse('api_product_search'), {'q': 'gadget', 'limit': 1}).json()
+        # Relevance order, not newest first
+        self.assertEqual([row['name'] for row in data['results']], ['Gadget'])
+        self.assertIn('page=2', data['next'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual([row['name'] for row in data['results']], ['Gadget Case'])
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.client.get(reverse('api_product_search')).status_code, 400)
+
+        product = self.products[0]
+        data = self.client.get(reverse('api_product_detail', args=[product.id])).json()
+        self.assertEqual((data['name'], data['price'], data['stock']), ('Widget 0', '10.00', 5))
+        self.assertEqual(self.client.get(reverse('api_product_detail', args=[9999])).status_code, 404)
+
+    def test_if_none_match_skips_queries(self):
+        url = reverse('api_product_list')
+        first = self.client.get(url)
+        self.assertTrue(first['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', first)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        detail = reverse('api_product_detail', args=[self.products[0].id])
+        etag = self.client.get(detail)['ETag']
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_changes_with_the_catalog(self):
+        url = reverse('api_product_list')
+        list_etag = self.client.get(url)['ETag']
+        detail = reverse('api_product_detail', args=[self.products[0].id])
+        detail_etag = self.client.get(detail)['ETag']
+
+        # A purchase moves stock via update(), which must still change the tags
+        user = User.objects.create(username='buyer')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(user, cart, 'addr', '555')
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock'], 4)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        self.products = [make_product(f'Item {i}', stock=20) for i in range(5)]
+
+    def add_orders(self, count):
+        start = Order.objects.count()
+        for n in range(start, start + count):
+            user = User.objects.create(username=f'customer{n}')
+            order = Order.objects.create(
+                user=user, order_number=f'ADM-{n:05d}', total_amount=Decimal('10.00'),
+                shipping_address='1 Main St', phone_number='555'
+            )
+            OrderItem.objects.create(order=order, product=self.products[n % 5], quantity=1, price=1)
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=self.products[n % 5], quantity=2)
+
+    def count_queries(self, name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(f'admin:store_{name}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_orders(2)
+        few = {name: self.count_queries(name)[0] for name in ('order', 'orderitem', 'cartitem', 'cart')}
+        self.add_orders(20)
+        many = {name: self.count_queries(name)[0] for name in ('order', 'orderitem', 'cartitem', 'cart')}
+        self.assertEqual(few, many)
+        _, response = self.count_queries('cartitem')
+        self.assertContains(response, '20.00')
+
+    def test_list_editable_saves_in_one_update(self):
+        products = list(Product.objects.order_by('-pk'))
+        data = {
+            'form-TOTAL_FORMS': len(products), 'form-INITIAL_FORMS': len(products),
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000, '_save': 'Save',
+        }
+        for i, product in enumerate(products):
+            data.update({f'form-{i}-id': product.id, f'form-{i}-price': product.price,
+                         f'form-{i}-stock': 7 if i < 3 else product.stock})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('admin:store_product_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "store_product"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(sorted(Product.objects.values_list('stock', flat=True)), [7, 7, 7, 20, 20])
+
+    def test_cart_date_filters_use_an_index(self):
+        for model in (Cart, CartItem):
+            since = timezone.now() - timedelta(days=7)
+            plan = model.objects.filter(created_at__gte=since).explain()
+            self.assertIn('_created_idx', plan, model)
+
+    def test_task_filter_lists_registered_names_without_scanning(self):
+        queue.enqueue(flaky_task, key='x')
+        url = reverse('admin:store_task_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, f'?task={flaky_task.task_name}')
+        self.assertFalse(any('DISTINCT' in q['sql'] for q in ctx.captured_queries))
+        response = self.client.get(url, {'task': 'store.order_placed'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    @override_settings(STORE_ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_counts_are_estimated_or_capped_past_the_limit(self):
+        Product.objects.filter(pk=self.products[1].pk).delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(ApproximateCountPaginator(Product.objects.order_by('pk'), 10).count, 5)
+        capped = ApproximateCountPaginator(Product.objects.filter(stock__gt=0).order_by('pk'), 10)
+        self.assertEqual(capped.count, 3)
+        with override_settings(STORE_ADMIN_EXACT_COUNT_LIMIT=100):
+            self.assertEqual(ApproximateCountPaginator(Product.objects.order_by('pk'), 10).count, 4)
+
+    @override_settings(STORE_ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_pages_past_an_approximate_total_are_reachable(self):
+        capped = ApproximateCountPaginator(Product.objects.filter(stock__gt=0).order_by('pk'), 2)
+        self.assertEqual((capped.count, capped.count_kind, capped.num_pages), (3, 'at_least', 3))
+        self.assertEqual(list(capped.page(3)), self.products[4:])
+        self.assertEqual(list(capped.page(9)), [])
+
+        # The pk span overshoots by the deleted row: the last page is empty, not an error
+        Product.objects.filter(pk=self.products[1].pk).delete()
+        estimated = ApproximateCountPaginator(Product.objects.order_by('pk'), 2)
+        self.assertEqual((estimated.count, estimated.count_kind, estimated.num_pages), (5, 'estimate', 3))
+        self.assertEqual(list(estimated.page(3)), [])
+
+        response = self.client.get(reverse('admin:store_product_changelist'))
+        self.assertContains(response, 'about 5 products')
+        response = self.client.get(reverse('admin:store_product_changelist'), {'stock_level': 'in'})
+        self.assertContains(response, 'at least 3 products')
+
+
+class HotPathIndexTests(TestCase):
+    def test_cart_lines_are_unique_per_product(self):
+        product = make_product('A')
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=cart, product=product, quantity=2)
+
+    def test_explain_views_reports_index_use_and_keeps_nothing(self):
+        for i in range(3):
+            make_product(f'Indexed {i}')
+        users, carts = User.objects.count(), Cart.objects.count()
+        out = StringIO()
+        call_command('explain_views', '--view=product_list', '--view=order_history', stdout=out)
+        output = out.getvalue()
+        self.assertIn('product_instock_recent_idx', output)
+        self.assertIn('0 queries with full table scans', output)
+        self.assertEqual((User.objects.count(), Cart.objects.count()), (users, carts))
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='shopper')
+        self.a, self.b = make_product('A', price='5.00'), make_product('B', price='20.00')
+        self.today = timezone.localdate()
+
+    def order(self, days_ago, lines, status='pending'):
+        n = Order.objects.count()
+        order = Order.objects.create(
+            user=self.user, order_number=f'SR-{n:05d}', total_amount=0, status=status,
+            shipping_address='1 Main St', phone_number='555'
+        )
+        for product, qty in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=qty, price=product.price)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def product_rollup(self):
+        return {
+            (row.day, row.product.name): (row.units, row.revenue, row.orders)
+            for row in DailyProductSales.objects.select_related('product')
+        }
+
+    def test_incremental_updates_follow_new_orders_and_status_changes(self):
+        yesterday = self.today - timedelta(days=1)
+        self.order(1, [(self.a, 2), (self.b, 1)])
+        self.order(1, [(self.a, 1)])
+        self.order(0, [(self.b, 3)], status='cancelled')
+        self.assertEqual(update_sales_rollups(), (3, 2))
+        self.assertEqual(self.product_rollup(), {
+            (yesterday, 'A'): (3, Decimal('15.00'), 2),
+            (yesterday, 'B'): (1, Decimal('20.00'), 1),
+        })
+        status = {(r.day, r.status): (r.orders, r.units, r.revenue) for r in DailyStatusSales.objects.all()}
+        self.assertEqual(status[(self.today, 'cancelled')], (1, 3, Decimal('60.00')))
+        self.assertEqual(status[(yesterday, 'pending')], (2, 4, Decimal('35.00')))
+
+        checkpoint = JobCheckpoint.objects.get(name='sales_rollups')
+        self.assertEqual(checkpoint.last_id, Order.objects.order_by('-id').first().id)
+        self.assertIsNotNone(checkpoint.last_time)
+
+        # Nothing new to scan; only days inside the late-commit grace window are redone
+        self.assertEqual(update_sales_rollups()[0], 0)
+
+        new = self.order(0, [(self.a, 4)])
+        new.status = 'cancelled'
+        new.save()
+        first = Order.objects.order_by('id').first()
+        first.status = 'shipped'
+        first.save()
+        self.assertEqual(update_sales_rollups(), (1, 2))
+        self.assertEqual(DailyStatusSales.objects.get(day=self.today, status='cancelled').orders, 2)
+        self.assertEqual(DailyStatusSales.objects.get(day=yesterday, status='shipped').units, 3)
+
+        before = self.product_rollup()
+        rebuild_sales_rollups()
+        self.assertEqual(self.product_rollup(), before)
+
+    def test_dashboard_reads_only_rollups(self):
+        self.order(3, [(self.a, 2)])
+        self.order(40, [(self.b, 1)])
+        call_command('build_sales_rollups', stdout=StringIO())
+        staff = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('sales_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('"store_order' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(response.context['report']['revenue'], Decimal('10.00'))
+        response = self.client.get(reverse('sales_dashboard'), {
+            'start': str(self.today - timedelta(days=365)), 'end': str(self.today)
+        })
+        self.assertEqual(response.context['report']['revenue'], Decimal('30.00'))
+        self.assertContains(response, 'Top products')
+
+
+calls = Counter()
+
+
+@queue.task('tests.flaky', max_attempts=2)
+def flaky_task(key, fail=False):
+    calls[key] += 1
+    if fail:
+        raise RuntimeError('boom')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def work(self):
+        out = StringIO()
+        call_command('run_worker', '--once', '--concurrency=1', stdout=out)
+        return out.getvalue()
+
+    def test_checkout_only_enqueues_and_the_worker_does_the_rest(self):
+        user = User.objects.create(username='buyer', email='buyer@example.com')
+        product = make_product('Last few', stock=4)
+        for _ in range(2):
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            order = place_order(user, cart, 'addr', '555')
+        self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['store.order_placed'] * 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+        with self.assertLogs('store.queue', 'WARNING') as logs:
+            output = self.work()
+        # 2 order_placed, 2 confirmations, 2 stock checks, one of each refresh
+        self.assertIn('8 done, 0 to retry, 0 dead', output)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn(order.order_number, mail.outbox[1].subject)
+        self.assertIn('Last few: 2 left', logs.output[-1])
+        self.assertTrue(DailyStatusSales.objects.exists())
+
+    def test_failures_retry_with_backoff_then_go_dead(self):
+        failing = queue.enqueue(flaky_task, key='bad', fail=True)
+        queue.enqueue(flaky_task, key='good')
+        with self.assertLogs('store.queue', 'WARNING'):
+            self.assertIn('1 done, 1 to retry, 0 dead', self.work())
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.QUEUED, 1))
+        self.assertGreater(failing.run_at, timezone.now())
+        self.assertIn('RuntimeError: boom', failing.last_error)
+
+        Task.objects.filter(pk=failing.pk).update(run_at=timezone.now())
+        with self.assertLogs('store.queue', 'ERROR'):
+            self.assertIn('0 done, 0 to retry, 1 dead', self.work())
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Task.DEAD)
+
+        # Dead letters can be sent round again from the admin
+        admin_user = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        self.client.force_login(admin_user)
+        self.client.post(reverse('admin:store_task_changelist'), {
+            'action': 'retry_tasks', '_selected_action': [failing.pk],
+        })
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.QUEUED, 0))
+
+    def test_unique_tasks_and_stale_locks(self):
+        first = queue.enqueue(flaky_task, unique=True, key='once')
+        self.assertEqual(queue.enqueue(flaky_task, unique=True, key='once'), first)
+        self.assertNotEqual(queue.enqueue(flaky_task, unique=True, key='other'), first)
+
+        claimed = queue.claim('crashed-worker', 1)
+        self.assertEqual([t.pk for t in claimed], [first.pk])
+        self.assertEqual(queue.requeue_stale(), 0)
+        Task.objects.filter(pk=first.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.requeue_stale(), 1)
+        self.work()
+        self.assertEqual(calls, {'once': 1, 'other': 1})
+
+    def test_stale_tasks_on_their_last_attempt_are_dead(self):
+        crashing = queue.enqueue(flaky_task, key='crash')
+        for attempt in range(crashing.max_attempts):
+            self.assertEqual(len(queue.claim('crashed-worker', 1)), 1)
+            Task.objects.filter(pk=crashing.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+            with override_settings(STORE_TASK_STALE_SECONDS=60 * 60 * 2):
+                self.assertEqual(queue.requeue_stale(), 0)
+            requeued = queue.requeue_stale()
+            crashing.refresh_from_db()
+            if attempt + 1 < crashing.max_attempts:
+                self.assertEqual((requeued, crashing.status), (1, Task.QUEUED))
+        self.assertEqual((requeued, crashing.status), (0, Task.DEAD))
+        self.assertIn('Worker vanished', crashing.last_error)
+        self.assertIsNotNone(crashing.finished_at)
+        self.assertEqual(calls, {})
+
+    def test_one_queued_copy_per_unique_task(self):
+        first = queue.enqueue(flaky_task, unique=True, key='once')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Task.objects.create(name=first.name, payload=first.payload, unique_key=first.unique_key)
+
+        # Once claimed, another copy may queue up behind the running one
+        queue.claim('worker', 1)
+        second = queue.enqueue(flaky_task, unique=True, key='once')
+        self.assertNotEqual(second, first)
+        Task.objects.filter(pk=first.pk).update(status=Task.DEAD)
+        self.assertEqual(queue.retry(Task.objects.filter(pk=first.pk)), 1)
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    def test_each_task_runs_once_across_threads(self):
+        calls.clear()
+        for n in range(12):
+            queue.enqueue(flaky_task, key=f'task{n}')
+        out = StringIO()
+        call_command('run_worker', '--once', '--concurrency=4', stdout=out)
+        self.assertIn('12 done', out.getvalue())
+        self.assertEqual(calls, {f'task{n}': 1 for n in range(12)})
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 12)
+
+    def test_concurrent_unique_enqueues_queue_one_task(self):
+        # Every thread passes the "already queued?" check before any inserts
+        barrier = threading.Barrier(6)
+        waited = threading.local()
+        create = Task.objects.create
+        queued = []
+
+        def create_after_everyone_checked(**fields):
+            if not getattr(waited, 'done', False):
+                waited.done = True
+                barrier.wait()
+            return create(**fields)
+
+        def enqueue():
+            try:
+                for attempt in range(50):
+                    try:
+                        queued.append(queue.enqueue(flaky_task, unique=True, key='once').pk)
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=enqueue) for _ in range(6)]
+        with mock.patch.object(Task.objects, 'create', create_after_everyone_checked):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(queued), 6)
+        self.assertEqual(set(queued), set(Task.objects.values_list('pk', flat=True)))
+        self.assertEqual(Task.objects.count(), 1)
+
+
+@override_settings(STORE_CATALOG_CACHE=None)
+class TemplateCachingTests(TestCase):
+    def setUp(self):
+        caches['template_fragments'].clear()
+
+    def test_templates_come_from_the_cached_loader(self):
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertEqual(type(loader).__module__, 'django.template.loaders.cached')
+
+    def test_product_cards_are_cached_until_the_product_changes(self):
+        product = make_product('Teapot', stock=3)
+        url = reverse('product_list')
+        self.assertContains(self.client.get(url), 'Teapot')
+
+        # A write that skips updated_at is not seen: the card came from cache
+        Product.objects.filter(pk=product.pk).update(name='Kettle')
+        self.assertContains(self.client.get(url), 'Teapot')
+
+        product.refresh_from_db()
+        product.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Kettle')
+        self.assertNotContains(response, 'Teapot')
+
+    def test_cached_cards_keep_per_visitor_csrf_tokens(self):
+        make_product('Teapot')
+        token = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+        first = token.findall(self.client.get(reverse('home')).content.decode())
+        second = token.findall(Client().get(reverse('home')).content.decode())
+        self.assertTrue(first and second)
+        self.assertNotEqual(first, second)
+
+    def test_nav_is_cached_per_user(self):
+        make_product('Teapot')
+        self.assertContains(self.client.get(reverse('home')), 'Register')
+        self.client.force_login(User.objects.create(username='alice'))
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'alice')
+        self.assertNotContains(response, 'Register')
+
+    def test_render_benchmark_compares_profiles(self):
+        seed_store(products=20, users=2, orders=5, seed=3)
+        results = RenderBenchmark(iterations=2).run()
+        self.assertEqual(len(results), 6)
+        for result in results.values():
+            self.assertGreater(result['render_p50_ms'], 0)
+
+
+@override_settings(STORE_CATALOG_CACHE=None, STORE_QUERY_BUDGET_STRICT=True,
+                   STORE_QUERY_METRICS_HEADERS=True)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        caches['template_fragments'].clear()
+        self.products = [make_product(f'Widget {n}', stock=3) for n in range(3)]
+
+    def test_setting_picks_the_views(self):
+        self.assertIs(resolve(reverse('home')).func, views.home)
+        with use_async_views():
+            self.assertIs(resolve(reverse('home')).func, async_views.home)
+            self.assertIs(resolve(reverse('view_cart')).func, async_views.view_cart)
+        self.assertIs(resolve(reverse('view_cart')).func, views.view_cart)
+
+    async def test_async_pages_match_sync_query_counts(self):
+        urls = [reverse('home'), reverse('product_list') + '?search=widget',
+                reverse('product_detail', args=[self.products[0].id])]
+        sync_counts = [(await AsyncClient().get(url))['X-Query-Count'] for url in urls]
+        with use_async_views():
+            for url, expected in zip(urls, sync_counts):
+                response = await AsyncClient().get(url)
+                self.assertContains(response, 'Widget 0')
+                self.assertEqual(response['X-Query-Count'], expected)
+            self.assertEqual((await AsyncClient().get(reverse('product_detail', args=[999]))).status_code, 404)
+
+    async def test_async_cart_pages(self):
+        user = await User.objects.acreate(username='shopper')
+        cart = await Cart.objects.acreate(user=user)
+        await CartItem.objects.acreate(cart=cart, product=self.products[1], quantity=2)
+        client = AsyncClient()
+        await client.aforce_login(user)
+        anonymous = AsyncClient()
+        with use_async_views():
+            response = await client.get(reverse('view_cart'))
+            self.assertContains(response, 'Widget 1')
+            self.assertContains(response, 'shopper')
+            self.assertEqual(response.context['total'], Decimal('20.00'))
+
+            anonymous.cookies['cart'] = SessionCart({self.products[2].id: 1}).to_cookie()
+            response = await anonymous.get(reverse('view_cart'))
+            self.assertContains(response, 'Widget 2')
+            self.assertContains(response, 'Register')
+
+    @override_settings(STORE_CATALOG_CACHE='catalog')
+    async def test_async_pages_use_the_catalog_cache(self):
+        caches['catalog'].clear()
+        with use_async_views():
+            first = await AsyncClient().get(reverse('product_list'))
+            second = await AsyncClient().get(reverse('product_list'))
+        self.assertEqual(first['X-Catalog-Cache'], 'miss')
+        self.assertEqual(second['X-Catalog-Cache'], 'hit')
+        self.assertEqual(len(first.content), len(second.content))
+
+
+class AsgiBenchmarkTests(TransactionTestCase):
+    @override_settings(STORE_CATALOG_CACHE=None)
+    def test_compares_sync_and_async_views(self):
+        seed_store(products=20, users=2, orders=5, seed=4)
+        results = AsgiBenchmark(iterations=4, connections=2, warmup=1).run()
+        self.assertEqual(len(results), 8)
+        self.assertIn('view_cart:async', results)
+        for result in results.values():
+            self.assertEqual(result['iterations'], 4)
+            self.assertGreater(result['throughput_rps'], 0)
+
+
+class SqliteProductionProfileTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=make_product('Lamp', stock=2), quantity=1)
+
+    def test_profile_pragmas_apply_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings_dict = {
+                **copy.deepcopy(connection.settings_dict),
+                **copy.deepcopy(settings.SQLITE_PRODUCTION_PROFILE),
+                'NAME': os.path.join(tmp, 'tuned.sqlite3'),
+            }
+            tuned = type(connections['default'])(settings_dict, alias='tuned')
+            try:
+                with tuned.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                tuned.close()
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000,
+            'cache_size': -20000, 'mmap_size': 134217728,
+        })
+        self.assertEqual(tuned.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(tuned.settings_dict['CONN_MAX_AGE'], 600)
+
+    @mock.patch('store.orders.time.sleep')
+    def test_checkout_retries_when_the_database_is_locked(self, sleep):
+        locked = OperationalError('database is locked')
+        with mock.patch('store.orders.reserve_cart', side_effect=[locked, None]) as reserve:
+            order = place_order(self.user, self.cart, 'addr', '555')
+        self.assertEqual(reserve.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(order.items.get().product.stock, 1)
+        self.assertFalse(Cart.objects.exists())
+
+    @mock.patch('store.orders.time.sleep')
+    def test_retries_are_limited_to_lock_errors_outside_transactions(self, sleep):
+        locked = OperationalError('database is locked')
+        with override_settings(STORE_CHECKOUT_LOCK_RETRIES=3), \
+                mock.patch('store.orders.reserve_cart', side_effect=locked) as reserve:
+            with self.assertRaises(OperationalError):
+                place_order(self.user, self.cart, 'addr', '555')
+            self.assertEqual(reserve.call_count, 3)
+
+            # Inside an outer transaction a retry can't undo what came before
+            reserve.reset_mock()
+            with self.assertRaises(OperationalError), transaction.atomic():
+                place_order(self.user, self.cart, 'addr', '555')
+            self.assertEqual(reserve.call_count, 1)
+
+        with mock.patch('store.orders.reserve_cart', side_effect=OperationalError('no such table')) as reserve:
+            with self.assertRaises(OperationalError):
+                place_order(self.user, self.cart, 'addr', '555')
+            self.assertEqual(reserve.call_count, 1)
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(STORE_REPLICA_DATABASE='replica', STORE_CATALOG_CACHE=None)
+class ReplicaRoutingTests(TransactionTestCase):
+    # Committed rows, so the replica connection (a mirror of the test
+    # database) can see them and reads are outside any transaction
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        caches['template_fragments'].clear()
+        self.product = make_product('Desk', stock=4)
+        self.user = User.objects.create_user('reader', password='pw')
+
+    def queries_on(self, alias, request):
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def test_catalog_reads_go_to_the_replica(self):
+        replica = self.queries_on('replica', lambda: self.client.get(reverse('product_list')))
+        self.assertTrue(any('store_product' in sql for sql in replica))
+        # Outside a request everything stays on the primary
+        self.assertEqual(Product.objects.get(pk=self.product.pk)._state.db, 'default')
+
+    def test_writers_stay_on_the_primary(self):
+        self.client.force_login(self.user)
+        CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=self.product, quantity=1)
+        response = self.client.post(reverse('checkout'), {
+            'shipping_address': '1 Main St', 'phone_number': '555'
+        })
+        self.assertIn('db_pinned', response.cookies)
+
+        # The redirected GET carries the pin, so it reads its own write
+        replica = self.queries_on('replica', lambda: self.client.get(reverse('product_list')))
+        self.assertEqual(replica, [])
+
+        self.client.cookies.pop('db_pinned')
+        replica = self.queries_on('replica', lambda: self.client.get(reverse('order_history')))
+        self.assertTrue(any('store_order' in sql for sql in replica))
+
+    def test_cart_writes_do_not_pin(self):
+        self.client.force_login(self.user)
+        Cart.objects.create(user=self.user)
+        # get_or_create goes through the write router; the session saves its cart count
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('db_pinned', response.cookies)
+
+        response = self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        self.assertNotIn('db_pinned', response.cookies)
+        replica = self.queries_on('replica', lambda: self.client.get(reverse('product_list')))
+        self.assertTrue(any('store_product' in sql for sql in replica))
+
+    def test_explain_views_explains_replica_queries(self):
+        out = StringIO()
+        # The command's rollback transaction keeps reads on the primary, so route by hand
+        with mock.patch.object(ReplicaRouter, 'db_for_read',
+                               lambda self, model, **hints: 'replica' if model is Product else None):
+            call_command('explain_views', '--view=product_list', stdout=out)
+        self.assertIn('[replica] SELECT', out.getvalue())
+
+    def test_router_rules(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        token = replica.current_state.set(replica.RoutingState())
+        try:
+            with mock.patch.object(connections['default'], 'in_atomic_block', False):
+                self.assertEqual(router.db_for_read(Product), 'replica')
+                self.assertIsNone(router.db_for_read(Cart))
+                self.assertEqual(router.db_for_read(OrderItem, instance=self.product), 'default')
+                self.assertEqual(router.db_for_write(Cart), 'default')
+                self.assertEqual(router.db_for_read(Product), 'replica')
+                self.assertEqual(router.db_for_write(Product), 'default')
+                # Once the request has written, it reads from the primary too
+                self.assertIsNone(router.db_for_read(Product))
+        finally:
+            replica.current_state.reset(token)
+        self.assertFalse(router.allow_migrate('replica', 'store'))
+
+
+class ReplicaCopyTests(TransactionTestCase):
+    def test_copy_database_snapshots_the_primary(self):
+        make_product('Chair')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'replica.sqlite3')
+            self.assertGreater(replica.copy_database(connection, path), 0)
+            copy = sqlite3.connect(path)
+            try:
+                names = copy.execute('SELECT name FROM store_product').fetchall()
+            finally:
+                copy.close()
+        self.assertEqual(names, [('Chair',)])
+
+    def test_replica_requires_a_shared_catalog_cache(self):
+        with override_settings(STORE_REPLICA_DATABASE='replica'):
+            self.assertEqual([e.id for e in check_replica_catalog_cache(None)], ['store.E001'])
+            with override_settings(STORE_CATALOG_CACHE=None):
+                self.assertEqual(check_replica_catalog_cache(None), [])
+            with tempfile.TemporaryDirectory() as tmp, override_settings(
+                CACHES={**settings.CACHES, 'shared': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': tmp,
+                }},
+                STORE_CATALOG_CACHE='shared',
+            ):
+                self.assertEqual(check_replica_catalog_cache(None), [])
+        self.assertEqual(check_replica_catalog_cache(None), [])
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.enterContext(override_settings(STATIC_ROOT=root, STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'store.storage.CompressedManifestStaticFilesStorage'},
+        }))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(root, 'staticfiles.json')) as f:
+            self.hashed = json.load(f)['paths']['css/style.css']
+        self.root = root
+
+    def test_collectstatic_writes_hashed_names_and_gzip_variants(self):
+        self.assertRegex(self.hashed, r'^css/style\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, self.hashed)
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as packed:
+            self.assertEqual(packed.read(), f.read())
+        # Images are already compressed
+        self.assertFalse(any(name.endswith(('.png.gz', '.jpg.gz')) for name in os.listdir(
+            os.path.join(self.root, 'images')
+        )))
+
+    def test_hashed_files_are_immutable_and_served_precompressed(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        response = files.serve_static(request, self.hashed)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        with open(os.path.join(self.root, self.hashed + '.gz'), 'rb') as f:
+            self.assertEqual(b''.join(response.streaming_content), f.read())
+
+        plain = files.serve_static(RequestFactory().get('/'), self.hashed)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertNotEqual(plain['ETag'], response['ETag'])
+
+        manifest = files.serve_static(RequestFactory().get('/'), 'staticfiles.json')
+        self.assertEqual(manifest['Cache-Control'], 'public, max-age=0, must-revalidate')
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        os.makedirs(os.path.join(media, 'products'))
+        with open(os.path.join(media, 'products', 'manual.txt'), 'wb') as f:
+            f.write(b'0123456789' * 10)
+        self.url = settings.MEDIA_URL + 'products/manual.txt'
+
+    def test_long_lived_cache_and_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789' * 10)
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.STORE_MEDIA_MAX_AGE}')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 5-14/100')
+        self.assertEqual(b''.join(response.streaming_content), b'5678901234')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # A stale If-Range gets the whole (changed) file instead of a piece
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_and_outside_files_are_not_found(self):
+        self.assertEqual(self.client.get(settings.MEDIA_URL + 'products/none.txt').status_code, 404)
+        self.assertEqual(self.client.get(settings.MEDIA_URL + '../manage.py').status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
@@ -1,14 +1,18 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Read-heavy pages have async twins for ASGI deployments
+catalog = async_views if settings.STORE_ASYNC_VIEWS else views
 
 urlpatterns = [
     # Home and Products
-    path('', views.home, name='home'),
-    path('products/', views.product_list, name='product_list'),
-    path('product/<int:product_id>/', views.product_detail, name='product_detail'),
+    path('', catalog.home, name='home'),
+    path('products/', catalog.product_list, name='product_list'),
+    path('product/<int:product_id>/', catalog.product_detail, name='product_detail'),
     
     # Cart
-    path('cart/', views.view_cart, name='view_cart'),
+    path('cart/', catalog.view_cart, name='view_cart'),
     path('add-to-cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('update-cart-item/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('remove-from-cart/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
@@ -26,4 +30,13 @@ urlpatterns = [
     
     # User Profile
     path('profile/', views.profile, name='profile'),
+    
+    # Read-only JSON API
+    path('api/products/', api.product_list, name='api_product_list'),
+    path('api/products/search/', api.product_search, name='api_product_search'),
+    path('api/products/<int:product_id>/', api.product_detail, name='api_product_detail'),
+    
+    # Monitoring
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('sales/', views.sales_dashboard, name='sales_dashboard'),
 ]
\ No newline at end of file
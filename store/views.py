@@ -2,19 +2,32 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q
-import uuid
-from .models import Product, Cart, CartItem, Order, OrderItem, UserProfile
+from django.db.models import Count, Prefetch
+from .models import Product, Cart, Order, OrderItem, UserProfile
+from .search import search_products
+from .analytics import sales_report
+from .orders import place_order, OutOfStock
+from .reservations import reserve_cart
+from .recommendations import related_products
+from .carts import CartFull, uses_session_carts
+from .pagination import paginate_by_cursor
+from .cache import cache_catalog_page, catalog_cache_stats
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.utils import timezone
+from datetime import date, timedelta
 
+@cache_catalog_page
 def home(request):
     """Home page with featured products"""
     products = Product.objects.filter(stock__gt=0).order_by('-created_at')[:8]
     return render(request, 'store/home.html', {'products': products})
 
+@cache_catalog_page
 def product_list(request):
     """Product listing with search and pagination"""
     products = Product.objects.filter(stock__gt=0)
@@ -22,35 +35,75 @@ def product_list(request):
     # Search functionality
     search_query = request.GET.get('search', '')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
     
     # Pagination
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if settings.STORE_PRODUCT_PAGINATION == 'cursor' and not search_query:
+        # Keyset pages on (created_at, id): no COUNT(*), no OFFSET.
+        # Searches keep their relevance order on numbered pages instead.
+        page_obj = paginate_by_cursor(
+            products, request.GET.get('cursor'), settings.STORE_PRODUCTS_PER_PAGE
+        )
+    else:
+        if not search_query:
+            products = products.order_by('-created_at')
+        paginator = Paginator(products, settings.STORE_PRODUCTS_PER_PAGE)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
     
     return render(request, 'store/product_list.html', {
         'page_obj': page_obj,
         'search_query': search_query
     })
 
+@cache_catalog_page
 def product_detail(request, product_id):
     """Individual product detail page"""
     product = get_object_or_404(Product, id=product_id)
-    related_products = Product.objects.filter(stock__gt=0).exclude(id=product_id)[:4]
+    # Precomputed "bought together" neighbours; newest products until
+    # the recommendation job has seen orders for this one
+    related = related_products(product)
+    if not related:
+        related = Product.objects.filter(stock__gt=0).exclude(id=product_id).order_by('-created_at')[:4]
     
     return render(request, 'store/product_detail.html', {
         'product': product,
-        'related_products': related_products
+        'related_products': related
+    })
+
+@staff_member_required
+def cache_stats(request):
+    """Catalog page cache hit/miss counters"""
+    return JsonResponse(catalog_cache_stats())
+
+@staff_member_required
+def sales_dashboard(request):
+    """Sales figures for a date range, from the daily rollups only"""
+    today = timezone.localdate()
+    try:
+        last = date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+        first = date.fromisoformat(request.GET['start']) if request.GET.get('start') else last - timedelta(days=29)
+    except ValueError:
+        messages.error(request, 'Dates must look like 2024-01-31.')
+        last, first = today, today - timedelta(days=29)
+    if first > last:
+        first, last = last, first
+    return render(request, 'store/sales_dashboard.html', {
+        **admin.site.each_context(request),
+        'title': 'Sales',
+        'report': sales_report(first, last),
     })
 
 def get_or_create_cart(request):
-    """Helper function to get or create cart"""
+    """Helper function to get or create cart.
+    
+    Anonymous visitors get their cookie-backed SessionCart (no database
+    rows) unless STORE_ANONYMOUS_CART = 'database'.
+    """
     if request.user.is_authenticated:
         cart, created = Cart.objects.get_or_create(user=request.user)
+    elif uses_session_carts():
+        cart = request.session_cart
     else:
         session_key = request.session.session_key
         if not session_key:
@@ -59,29 +112,44 @@ def get_or_create_cart(request):
         cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
     return cart
 
+def remember_cart_count(request, count):
+    """Keep the cart badge count in the session so base.html needs no query"""
+    if request.session.get('cart_count') != count:
+        request.session['cart_count'] = count
+
+def update_cart_summary(request, cart):
+    """Refresh the cart's stored totals after its lines change"""
+    summary = cart.refresh_summary()
+    # Cookie carts carry their own count; don't start a session for them
+    if isinstance(cart, Cart):
+        remember_cart_count(request, summary['item_count'])
+    return summary
+
+def available_products(cart):
+    """Products annotated with ``available``, not counting stock held by other carts' checkouts"""
+    return Product.objects.with_available(exclude_cart=cart if isinstance(cart, Cart) else None)
+
+def available_to(cart, product_id):
+    return available_products(cart).values_list('available', flat=True).get(pk=product_id)
+
 def add_to_cart(request, product_id):
     """Add product to cart"""
     if request.method == 'POST':
-        product = get_object_or_404(Product, id=product_id)
+        cart = get_or_create_cart(request)
+        product = get_object_or_404(available_products(cart), id=product_id)
         quantity = int(request.POST.get('quantity', 1))
         
-        if quantity > product.stock:
-            messages.error(request, f'Only {product.stock} items available in stock.')
+        if quantity > product.available:
+            messages.error(request, f'Only {max(product.available, 0)} items available in stock.')
             return redirect('product_detail', product_id=product_id)
         
-        cart = get_or_create_cart(request)
-        
-        # Check if item already in cart
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        try:
+            cart.add(product, quantity)
+        except CartFull as e:
+            messages.error(request, str(e))
+            return redirect('view_cart')
         
+        update_cart_summary(request, cart)
         messages.success(request, f'{product.name} added to cart!')
         return redirect('view_cart')
     
@@ -90,51 +158,80 @@ def add_to_cart(request, product_id):
 def view_cart(request):
     """View shopping cart"""
     cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    cart_items = cart.lines()
     
-    total = sum(item.total_price for item in cart_items)
+    summary = cart.summary()
+    if isinstance(cart, Cart):
+        remember_cart_count(request, summary['item_count'])
     
     return render(request, 'store/cart.html', {
         'cart_items': cart_items,
-        'total': total
+        'total': summary['subtotal']
     })
 
 def update_cart_item(request, item_id):
     """Update cart item quantity"""
     if request.method == 'POST':
-        cart_item = get_object_or_404(CartItem, id=item_id)
+        cart = get_or_create_cart(request)
+        cart_item = cart.get_line(item_id)
         quantity = int(request.POST.get('quantity', 1))
+        # Shrinking a line always works; growing it needs unreserved stock
+        available = available_to(cart, cart_item.product_id) if quantity > cart_item.quantity else quantity
         
         if quantity <= 0:
-            cart_item.delete()
+            cart.remove_line(cart_item)
             messages.success(request, 'Item removed from cart.')
-        elif quantity > cart_item.product.stock:
-            messages.error(request, f'Only {cart_item.product.stock} items available.')
+        elif quantity > available:
+            messages.error(request, f'Only {max(available, 0)} items available.')
         else:
-            cart_item.quantity = quantity
-            cart_item.save()
+            cart.set_line_quantity(cart_item, quantity)
             messages.success(request, 'Cart updated successfully.')
+        
+        update_cart_summary(request, cart)
     
     return redirect('view_cart')
 
 def remove_from_cart(request, item_id):
     """Remove item from cart"""
-    cart_item = get_object_or_404(CartItem, id=item_id)
-    cart_item.delete()
+    cart = get_or_create_cart(request)
+    cart_item = cart.get_line(item_id)
+    cart.remove_line(cart_item)
+    update_cart_summary(request, cart)
     messages.success(request, 'Item removed from cart.')
     return redirect('view_cart')
 
+def out_of_stock_messages(request, error):
+    for item, available in error.lines:
+        messages.error(
+            request,
+            f'Only {available} of {item.product.name} left in stock '
+            f'(you asked for {item.quantity}).'
+        )
+
 @login_required
 def checkout(request):
     """Checkout process"""
     cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    cart_items = cart.items.select_related('product')
     
     if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('product_list')
     
-    total = sum(item.total_price for item in cart_items)
+    total = cart.summary()['subtotal']
+    
+    if request.method == 'GET':
+        # Hold the stock while the shopper fills in the form
+        try:
+            reserved_until = reserve_cart(cart)
+        except OutOfStock as e:
+            out_of_stock_messages(request, e)
+            return redirect('view_cart')
+        return render(request, 'store/checkout.html', {
+            'cart_items': cart_items,
+            'total': total,
+            'reserved_until': reserved_until,
+        })
     
     if request.method == 'POST':
         # Get form data
@@ -149,60 +246,63 @@ def checkout(request):
             })
         
         try:
-            with transaction.atomic():
-                # Create order
-                order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-                order = Order.objects.create(
-                    user=request.user,
-                    order_number=order_number,
-                    total_amount=total,
-                    shipping_address=shipping_address,
-                    phone_number=phone_number
-                )
-                
-                # Create order items
-                for cart_item in cart_items:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=cart_item.product,
-                        quantity=cart_item.quantity,
-                        price=cart_item.product.price
-                    )
-                    
-                    # Update stock
-                    cart_item.product.stock -= cart_item.quantity
-                    cart_item.product.save()
-                
-                # Clear cart
-                cart.delete()
-                
-                messages.success(request, f'Order placed successfully! Order number: {order_number}')
-                return redirect('order_confirmation', order_id=order.id)
-                
+            order = place_order(request.user, cart, shipping_address, phone_number)
+            remember_cart_count(request, 0)
+        except OutOfStock as e:
+            out_of_stock_messages(request, e)
+            return redirect('view_cart')
         except Exception as e:
             messages.error(request, 'An error occurred while processing your order.')
+        else:
+            messages.success(request, f'Order placed successfully! Order number: {order.order_number}')
+            return redirect('order_confirmation', order_id=order.id)
     
     return render(request, 'store/checkout.html', {
         'cart_items': cart_items,
         'total': total
     })
 
+def order_with_items(request, order_id):
+    """Order plus its items and products in two queries"""
+    orders = Order.objects.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+    return get_object_or_404(orders, id=order_id, user=request.user)
+
 @login_required
 def order_confirmation(request, order_id):
     """Order confirmation page"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = order_with_items(request, order_id)
     return render(request, 'store/order_confirmation.html', {'order': order})
 
 @login_required
 def order_history(request):
     """User's order history"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'store/order_history.html', {'orders': orders})
+    orders = (
+        Order.objects.filter(user=request.user)
+        .annotate(item_count=Count('items'))
+        .prefetch_related(
+            Prefetch(
+                'items',
+                queryset=OrderItem.objects.select_related('product').order_by('id'),
+                to_attr='item_list'
+            )
+        )
+        .order_by('-created_at', '-id')
+    )
+    
+    paginator = Paginator(orders, settings.STORE_ORDERS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    return render(request, 'store/order_history.html', {
+        'orders': page_obj,
+        'page_obj': page_obj
+    })
 
 @login_required
 def order_detail(request, order_id):
     """Order detail page"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = order_with_items(request, order_id)
     return render(request, 'store/order_detail.html', {'order': order})
 
 def register(request):
@@ -249,6 +349,8 @@ def login_view(request):
         
         if user is not None:
             login(request, user)
+            cart = Cart.objects.filter(user=user).only('item_count').first()
+            remember_cart_count(request, cart.item_count if cart else 0)
             messages.success(request, f'Welcome back, {user.username}!')
             return redirect('home')
         else: